@@ -11,7 +11,15 @@ Variogram estimation
 
 There are two major functions to estimate variograms. The :func:`variogram <hydrobox.geostat.variogram>`
 function and the :func:`gridsearch <hydrobox.geostat.gridsearch>`, which will select optimal
-variogram parameters, based on a cross-validated score.
+variogram parameters, based on a cross-validated score. The
+:func:`cross_validation <hydrobox.geostat.cross_validation>` scores a
+variogram by a fast leave-one-out cross-validation of ordinary kriging.
+:func:`batch_variogram <hydrobox.geostat.batch_variogram>` estimates one
+variogram per field of a station time series, with shared lag classes.
+:func:`fit_models <hydrobox.geostat.fit_models>` ranks all theoretical
+models by their fit to one experimental variogram and
+:func:`bootstrap <hydrobox.geostat.bootstrap>` estimates confidence
+envelopes of the experimental variogram and the model parameters.
 
 .. minigallery::  hydrobox.geostat.variogram hydrobox.geostat.gridsearch
     :add-heading: Variogram examples
@@ -23,7 +31,22 @@ Content of :py:mod:`hydrobox.geostat`:
     :template: module.rst
 
     variogram
+    batch_variogram
+    fit_models
+    bootstrap
     gridsearch
+    cross_validation
+
+Comparing many variograms of one sample, i.e. estimators or models, only
+changes the binning and fitting. A :class:`PairContext <hydrobox.geostat.PairContext>`
+calculates the pairwise distances and value differences once and shares
+them with all variograms and gridsearch runs built from it.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: class.rst
+
+    PairContext
 
 Kriging
 ~~~~~~~
@@ -43,8 +66,106 @@ kriging.
     ordinary_kriging
     universal_kriging
     ext_drift_kriging
+    batch_kriging
+
+For very large samples, :func:`approximate_kriging <hydrobox.geostat.approximate_kriging>`
+offers a covariance-tapered and a low-rank approximation of ordinary kriging.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    approximate_kriging
+
+Catchment means can be kriged directly by
+:func:`block_kriging <hydrobox.geostat.block_kriging>`, without
+interpolating a dense grid first.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    block_kriging
+
+New stations can be planned with :func:`network_design <hydrobox.geostat.network_design>`,
+which ranks candidate locations by the reduction of the kriging variance.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    network_design
+
+:func:`inverse_distance <hydrobox.geostat.inverse_distance>` is a fast
+inverse distance weighting baseline with the same grid and plot conventions.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    inverse_distance
+
+Conditional simulations propagate the kriging uncertainty. The
+:func:`simulate <hydrobox.geostat.simulate>` function simulates an ensemble
+and accumulates its mean, variance and quantiles, one realization at a time.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    simulate
+
+Catchment precipitation is often averaged by Thiessen polygons. The
+:class:`Thiessen <hydrobox.geostat.Thiessen>` class builds the station to
+catchment weights once and re-weights them, if stations are missing.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: class.rst
+
+    Thiessen
+
+Interpolated grids are aggregated to sub-catchments by
+:func:`zonal_statistics <hydrobox.geostat.zonal_statistics>`. The cell to zone
+operator is cached, thus a stack of fields is reduced by one sparse product.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: module.rst
+
+    zonal_statistics
+
+The interpolation grid is either given by its resolution or by a
+:class:`Grid <hydrobox.geostat.Grid>`, which specifies the bounding box,
+the cell size and an optional mask, i.e. of a catchment.
+
+.. autosummary::
+    :toctree: gen_modules/
+    :template: class.rst
+
+    Grid
+
+The :class:`Krige <gstools.Krige>` instances are cached by the content
+of the variogram and the kriging arguments. Repeated kriging of the same
+variogram, i.e. at another resolution, skips fitting and inverting the
+kriging system. The cache can be inspected with ``krige_cache.info()``
+and emptied with ``krige_cache.clear()``. Variograms are cached in
+``variogram_cache`` if requested by ``cache=True``. This cache can also
+keep the variograms on disk.
 
 """
-from .variogram import variogram
+from .variogram import variogram, batch_variogram, fit_models
 from .gridsearch import gridsearch
-from .kriging import ordinary_kriging, simple_kriging, universal_kriging, ext_drift_kriging
\ No newline at end of file
+from .cross_validation import cross_validation
+from .bootstrap import bootstrap
+from .context import PairContext
+from .kriging import ordinary_kriging, simple_kriging, universal_kriging, ext_drift_kriging, batch_kriging, progressive_kriging
+from .approximate import approximate_kriging
+from .block import block_kriging
+from .network import network_design
+from .simulation import simulate
+from .idw import inverse_distance
+from .thiessen import Thiessen
+from .zonal import zonal_statistics
+from .cache import krige_cache, variogram_cache
+from .grid import Grid
\ No newline at end of file
@@ -0,0 +1,360 @@
+"""
+Approximate kriging for very large samples.
+
+Both engines accept the same scikit-gstat :class:`Variogram <skgstat.Variogram>`
+as the kriging functions and mimic the call signature of
+:class:`Krige <gstools.Krige>`, so that they run through the same tiled,
+parallel and masked grid machinery.
+
+* :class:`TaperedKrige` multiplies the covariance with a compactly
+  supported Wendland taper. The kriging matrix becomes sparse and is
+  factorized with :func:`splu <scipy.sparse.linalg.splu>`.
+* :class:`NystroemKrige` approximates the covariance matrix by a low-rank
+  Nyström approximation built from a random subset of inducing points.
+
+"""
+from typing import List, Union, Literal
+import numpy as np
+import skgstat as skg
+import plotly.graph_objects as go
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from scipy.linalg import cho_factor, cho_solve
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.local import LocalKrige
+from hydrobox.geostat.kriging import _build_grid, _allocate, _finalize, _block_size, _run_blocks
+
+
+def wendland(r: np.ndarray) -> np.ndarray:
+    """
+    Wendland taper function with compact support on ``r < 1``. It is
+    positive definite up to three dimensions.
+    """
+    r = np.minimum(np.asarray(r, dtype=float), 1.)
+    return (1 - r)**4 * (4 * r + 1)
+
+
+class TaperedKrige:
+    """
+    Ordinary kriging with a tapered covariance. All covariances beyond
+    taper_range are zero, thus the kriging system is sparse. The estimate
+    is calculated in the dual form from a single solve of the system,
+    the kriging variance needs one sparse solve per target point.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    taper_range : float
+        Support of the taper. Defaults to the effective range of the
+        variogram. Smaller ranges are faster, but less exact.
+
+    """
+    def __init__(self, variogram: skg.Variogram, taper_range: float = None):
+        self.model = variogram.to_gstools()
+        self.coordinates = np.asarray(variogram.coordinates, dtype=float)
+        self.values = np.asarray(variogram.values, dtype=float)
+        self.taper_range = float(variogram.parameters[0] if taper_range is None else taper_range)
+        self.tree = cKDTree(self.coordinates)
+
+        # sparse covariance matrix of the observations
+        n = len(self.values)
+        dists = self.tree.sparse_distance_matrix(self.tree, self.taper_range, output_type='coo_matrix')
+        off = dists.row != dists.col
+        rows = np.concatenate((dists.row[off], np.arange(n)))
+        cols = np.concatenate((dists.col[off], np.arange(n)))
+        data = np.concatenate((self.covariance(dists.data[off]), np.full(n, self.model.sill)))
+        cov = sparse.coo_matrix((data, (rows, cols)), shape=(n, n))
+
+        # border the matrix with the unbiasedness condition
+        ones = sparse.csc_matrix(np.ones((n, 1)))
+        self._krige_mat = sparse.bmat([[cov, ones], [ones.T, None]], format='csc')
+        self._lu = None
+        self._weights = None
+
+    def covariance(self, h: np.ndarray) -> np.ndarray:
+        return self.model.covariance(h) * wendland(h / self.taper_range)
+
+    @property
+    def lu(self):
+        # factorized lazily, as SuperLU objects can't be sent to workers
+        if self._lu is None:
+            self._lu = splu(self._krige_mat)
+        return self._lu
+
+    @property
+    def weights(self) -> np.ndarray:
+        """
+        Solution of the dual kriging system
+        """
+        if self._weights is None:
+            self._weights = self.lu.solve(np.append(self.values, 0.))
+        return self._weights
+
+    @property
+    def krige_size(self) -> int:
+        return self._krige_mat.shape[0]
+
+    @property
+    def ext_drift_no(self) -> int:
+        return 0
+
+    @property
+    def density(self) -> float:
+        """
+        Fraction of non-zero elements in the kriging matrix
+        """
+        return self._krige_mat.nnz / self.krige_size**2
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lu'] = None
+        return state
+
+    def __call__(self, pos: List[np.ndarray], mesh_type: str = 'unstructured', ext_drift=None, return_var: bool = True, store: bool = False):
+        points = np.column_stack(pos).astype(float)
+        n = len(self.values)
+
+        # sparse covariances between targets and observations
+        dists = cKDTree(points).sparse_distance_matrix(self.tree, self.taper_range, output_type='coo_matrix')
+        cross = sparse.csr_matrix((self.covariance(dists.data), (dists.row, dists.col)), shape=(len(points), n))
+
+        field = cross @ self.weights[:n] + self.weights[n]
+        if not return_var:
+            return field
+
+        rhs = np.vstack((cross.T.toarray(), np.ones((1, len(points)))))
+        sigma = np.maximum(self.model.sill - np.einsum('ij,ij->j', rhs, self.lu.solve(rhs)), 0)
+        return field, sigma
+
+
+class NystroemKrige:
+    """
+    Kriging with a low-rank Nyström approximation of the covariance matrix.
+    ``n_inducing`` observations are drawn as inducing points and the
+    covariance of all observations is approximated through their
+    covariance to the inducing points. The system is solved with the
+    Woodbury identity, which costs only O(n m²). The mean is estimated
+    by the sample mean, as in simple kriging.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    n_inducing : int
+        Number of inducing points. Defaults to 500.
+    seed : int
+        Seed for drawing the inducing points.
+
+    """
+    def __init__(self, variogram: skg.Variogram, n_inducing: int = 500, seed: int = None):
+        self.model = variogram.to_gstools()
+        coordinates = np.asarray(variogram.coordinates, dtype=float)
+        values = np.asarray(variogram.values, dtype=float)
+        n = len(values)
+
+        rng = np.random.default_rng(seed)
+        idx = np.sort(rng.choice(n, size=min(n_inducing, n), replace=False))
+        self.inducing = coordinates[idx]
+        self.mean = values.mean()
+
+        # the nugget acts as noise, use a jitter if there is none
+        sill = self.model.sill
+        self.noise = max(self.model.nugget, 1e-6 * sill)
+
+        c_mm = self.model.covariance(cdist(self.inducing, self.inducing))
+        c_mm[np.diag_indices_from(c_mm)] += 1e-10 * sill
+        c_nm = self.model.covariance(cdist(coordinates, self.inducing))
+
+        self._c_mm = cho_factor(c_mm)
+        self._sigma = cho_factor(self.noise * c_mm + c_nm.T @ c_nm)
+        self._alpha = cho_solve(self._sigma, c_nm.T @ (values - self.mean))
+
+    @property
+    def krige_size(self) -> int:
+        return len(self.inducing) + 1
+
+    @property
+    def ext_drift_no(self) -> int:
+        return 0
+
+    def __call__(self, pos: List[np.ndarray], mesh_type: str = 'unstructured', ext_drift=None, return_var: bool = True, store: bool = False):
+        points = np.column_stack(pos).astype(float)
+        c_xm = self.model.covariance(cdist(points, self.inducing))
+
+        field = self.mean + c_xm @ self._alpha
+        if not return_var:
+            return field
+
+        prior = np.einsum('ij,ji->i', c_xm, cho_solve(self._c_mm, c_xm.T))
+        posterior = self.noise * np.einsum('ij,ji->i', c_xm, cho_solve(self._sigma, c_xm.T))
+        sigma = np.maximum(self.model.sill - prior + posterior, 0)
+        return field, sigma
+
+
+def approximate_kriging(
+    variogram: skg.Variogram,
+    grid_resolution: Union[int, Grid],
+    method: Literal['taper', 'nystroem'] = 'taper',
+    taper_range: float = None,
+    n_inducing: int = 500,
+    n_validate: int = 100,
+    n_reference: int = 1000,
+    seed: int = None,
+    return_type: Literal['plot', 'grid', 'describe'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    **kwargs
+) -> Union[List[np.ndarray], dict, go.Figure]:
+    """
+    Approximate kriging for samples, which are too large for the exact
+    kriging system. Two engines are available:
+
+    * ``'taper'``: Ordinary kriging with a covariance tapered by a
+      compactly supported Wendland function. The kriging matrix is sparse
+      and factorized with a sparse LU decomposition.
+    * ``'nystroem'``: Simple kriging around the sample mean with a
+      low-rank Nyström approximation of the covariance matrix, based on
+      ``n_inducing`` randomly drawn inducing points.
+
+    Use ``return_type='describe'`` to compare the approximation to the
+    exact :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`
+    at ``n_validate`` random grid cells.
+
+    .. note::
+        Both engines treat the nugget as measurement error, thus the
+        reference is ordinary kriging with ``exact=False``. Samples of
+        up to ``n_reference`` observations are compared to the full
+        kriging system. Larger samples are compared to kriging of the
+        ``n_reference`` observations closest to each validation cell,
+        as the full system can not be solved.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    grid_resolution : int, hydrobox.geostat.Grid
+        Resoultion of the interpolation grid, or a
+        :class:`Grid <hydrobox.geostat.Grid>`.
+    method : str
+        Approximation to use. Either ``'taper'`` (default) or
+        ``'nystroem'``.
+    taper_range : float
+        Support of the taper, if method is ``'taper'``. Defaults to
+        the effective range of the variogram.
+    n_inducing : int
+        Number of inducing points, if method is ``'nystroem'``.
+    n_validate : int
+        Number of grid cells for the comparison with exact kriging,
+        if return_type is ``'describe'``.
+    n_reference : int
+        Maximum size of the exact kriging system of the comparison, if
+        return_type is ``'describe'``. Defaults to 1000.
+    seed : int
+        Seed for drawing inducing points and validation cells.
+    return_type : str
+        Return the interpolated grid (``'grid'``), a plot of the grid
+        (``'plot'``), or a dictionary of the grids along with the
+        approximation error (``'describe'``).
+    max_memory : float
+        Memory budget in megabytes for the blocks of grid cells.
+        Refer to :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
+    n_jobs : int
+        Number of worker processes.
+        Refer to :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
+    output_dir : str
+        Directory to write memory-mapped result grids to.
+        Refer to :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
+    return_variance : bool
+        If False, only the interpolation grid is calculated.
+
+    Returns
+    -------
+    results : numpy.ndarray, numpy.ndarray
+        Interpolation grid and kriging error grid
+    description : dict
+        If return_type is ``'describe'``. Contains the grids as
+        ``'field'`` and ``'sigma'`` and the ``'rmse'`` and
+        ``'max_error'`` of the field compared to exact kriging.
+        ``'reference'`` is ``'global'`` for the full kriging system and
+        ``'local'`` for the systems of the closest observations of each
+        validation cell.
+    fig : plotly.graph_objects.Figure, matplotlib.Figure
+        Figure of the result plot.
+
+    """
+    if method == 'taper':
+        krige = TaperedKrige(variogram, taper_range=taper_range)
+    elif method == 'nystroem':
+        krige = NystroemKrige(variogram, n_inducing=n_inducing, seed=seed)
+    else:
+        raise ValueError("method has to be one of ['taper', 'nystroem']")
+
+    # build the grid and krige block by block
+    grid = _build_grid(variogram, grid_resolution)
+    fill = None if grid.mask is None else np.nan
+    field = _allocate(grid.shape, output_dir, 'field', fill=fill)
+    if return_variance:
+        sigma = _allocate(grid.shape, output_dir, 'sigma', fill=fill)
+        sigma_flat = sigma.reshape(-1)
+    else:
+        sigma = sigma_flat = None
+
+    block_size = _block_size(krige.krige_size, max_memory, grid.n_active)
+    _run_blocks(krige, grid, field.reshape(-1), sigma_flat, block_size, n_jobs=n_jobs)
+    field, sigma = _finalize(field), _finalize(sigma)
+
+    if return_type == 'grid':
+        return (field, sigma)
+    elif return_type == 'describe':
+        # compare to exact kriging on a random subset of cells
+        rng = np.random.default_rng(seed)
+        cells = rng.choice(grid.n_active, size=min(n_validate, grid.n_active), replace=False)
+        cells = np.sort(cells) if grid.active is None else grid.active[np.sort(cells)]
+        pos = grid.positions(cells)
+
+        # the engines use the nugget as measurement error, like exact=False
+        args = dict(exact=False, cond_err='nugget', pseudo_inv=False)
+        if len(variogram.values) <= n_reference:
+            reference = 'global'
+            ref = variogram.to_gs_krige(**args)(pos, return_var=False, store=False)
+        else:
+            # the full system is too large, krige each validation cell
+            # from its own closest observations
+            reference = 'local'
+            local = LocalKrige(variogram, n_neighbours=n_reference, **args)
+            ref = np.array([
+                local.system(local.neighbours(p))(p[:, None], return_var=False, store=False)[0]
+                for p in np.column_stack(pos)
+            ])
+        error = np.asarray(field).reshape(-1)[cells] - ref
+
+        return dict(
+            method=method,
+            field=field,
+            sigma=sigma,
+            n_validate=len(cells),
+            reference=reference,
+            rmse=float(np.sqrt(np.mean(error**2))),
+            max_error=float(np.max(np.abs(error)))
+        )
+
+    # return the plot
+    if field.ndim > 2:
+        raise ValueError('Plotting not supported for dim > 2.')
+
+    pfunc = plot_function_loader('kriging')
+    return pfunc(
+        func_args=dict(
+            variogram=variogram,
+            field=field,
+            sigma=sigma
+        ),
+        plot_args=kwargs
+    )
@@ -0,0 +1,174 @@
+from typing import List, Union, Literal
+import numpy as np
+import pandas as pd
+import skgstat as skg
+from scipy.spatial.distance import cdist
+
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.kriging import _get_krige
+
+
+def _block_points(
+    blocks: Union[List[np.ndarray], np.ndarray],
+    grid: Grid = None,
+    discretization: int = 10
+):
+    """
+    Discretize the blocks into points. Returns the block labels and a
+    list of point arrays of shape (n_points, n_dims).
+    """
+    max_points = discretization**2
+
+    # label array on a grid
+    if grid is not None:
+        labels = np.asarray(blocks)
+        if labels.shape != grid.shape:
+            raise ValueError('blocks has shape %s, but the grid has shape %s.' % (labels.shape, grid.shape))
+        flat = labels.reshape(-1)
+        names = np.unique(flat[flat >= 0])
+
+        points = []
+        for name in names:
+            cells = np.flatnonzero(flat == name)
+            # use evenly spaced cells of large blocks
+            if len(cells) > max_points:
+                cells = cells[np.linspace(0, len(cells) - 1, max_points).astype(int)]
+            points.append(np.column_stack(grid.positions(cells)))
+        return list(names), points
+
+    # polygons are rasterized with discretization cells along the longer side
+    points = []
+    for polygon in blocks:
+        polygon = np.asarray(polygon, dtype=float)
+        extent = np.max(polygon.max(axis=0) - polygon.min(axis=0))
+        poly_grid = Grid.from_polygon(polygon, extent / discretization)
+        cells = poly_grid.active
+        if len(cells) == 0:
+            raise ValueError('A polygon is too small for the discretization. Increase discretization.')
+        points.append(np.column_stack(poly_grid.positions(cells)))
+    return list(range(len(points))), points
+
+
+def block_kriging(
+    variogram: skg.Variogram,
+    blocks: Union[List[np.ndarray], np.ndarray],
+    grid: Grid = None,
+    discretization: int = 10,
+    values: np.ndarray = None,
+    exact: bool = True,
+    cond_err: Union[Literal['nugget'], float, list] = 'nugget',
+    pseudo_inv: bool = True,
+    pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
+    return_type: Literal['describe', 'weights'] = 'describe'
+) -> Union[pd.DataFrame, np.ndarray]:
+    """
+    Ordinary block kriging of areal means, i.e. catchment averages,
+    without kriging a dense grid. Each block is discretized into points
+    and the point-to-block covariances are averaged over these points.
+    All blocks are then solved at once against the same inverted
+    kriging system, which is shared with
+    :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
+
+    The block kriging weights do not depend on the observed values.
+    Pass a ``(time, station)`` matrix as values, to apply the weights
+    to all timesteps at once.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    blocks : list, numpy.ndarray
+        Either a list of 2D polygons, each of shape ``(n_vertices, 2)``,
+        or an integer label array of the shape of grid. Each label
+        ``>= 0`` is a block, negative labels belong to no block.
+    grid : hydrobox.geostat.Grid
+        Grid of the label array. Needed, if blocks is a label array.
+    discretization : int
+        Polygons are discretized by ``discretization`` cells along
+        their longer side. Blocks of a label array use at most
+        ``discretization**2`` evenly spaced cells. Defaults to 10.
+    values : numpy.ndarray
+        Optional array of shape ``(n_fields, n_locations)``. If given,
+        the block means of all fields are returned.
+    exact : bool
+        If True (default), the input data will be matched exactly.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    cond_err : str, float, list
+        Measurement error, or variogram nugget.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv : bool
+        If True, the Kriging is more robust, but also slower.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv_type : str
+        Type of matrix inversion used if pseudo_inv is True.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    return_type : str
+        ``'describe'`` (default) returns the block means and variances.
+        ``'weights'`` returns the kriging weights of the observations
+        for each block.
+
+    Returns
+    -------
+    description : pandas.DataFrame
+        If return_type is ``'describe'`` and values is None. One row per
+        block with the columns ``'mean'`` and ``'variance'``.
+    means : pandas.DataFrame
+        If return_type is ``'describe'`` and values is given.
+        Block means of shape ``(n_fields, n_blocks)``.
+    weights : numpy.ndarray
+        If return_type is ``'weights'``. Array of shape
+        ``(n_locations, n_blocks)``.
+
+    """
+    if not isinstance(blocks, (list, tuple)) and grid is None:
+        raise AttributeError('A grid is needed for a label array of blocks.')
+    names, points = _block_points(blocks, grid=grid, discretization=discretization)
+
+    krige = _get_krige(
+        variogram,
+        exact=exact,
+        cond_err=cond_err,
+        pseudo_inv=pseudo_inv,
+        pseudo_inv_type=pseudo_inv_type
+    )
+    model = krige.model
+    coords = np.asarray(variogram.coordinates, dtype=float)
+    n = len(coords)
+
+    # distances in the rotated and scaled space of the model, like
+    # the point kriging system of an anisotropic model
+    def isometrize(p):
+        return np.asarray(model.isometrize(p.T), dtype=float).T
+
+    # point-to-block and within-block covariances
+    iso_coords = isometrize(coords)
+    rhs = np.ones((krige.krige_size, len(points)))
+    block_cov = np.empty(len(points))
+    for i, p in enumerate(points):
+        p = isometrize(p)
+        rhs[:n, i] = model.covariance(cdist(iso_coords, p)).mean(axis=1)
+        block_cov[i] = model.covariance(cdist(p, p)).mean()
+
+    # solve all blocks at once
+    weights = krige._krige_mat @ rhs
+
+    if return_type == 'weights':
+        return weights[:n]
+    elif return_type != 'describe':
+        raise ValueError("return_type '%s' not supported." % return_type)
+
+    if values is not None:
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        return pd.DataFrame(values @ weights[:n], columns=names)
+
+    return pd.DataFrame(
+        dict(
+            mean=krige._krige_cond @ weights,
+            variance=np.maximum(block_cov - np.einsum('ij,ij->j', rhs, weights), 0)
+        ),
+        index=names
+    )
@@ -0,0 +1,249 @@
+"""
+Resampling uncertainty of variograms.
+
+The bootstrap resamples the point pairs of each lag class, or whole
+clusters of observations, and estimates the experimental variogram and
+the model parameters of every replicate. The distances, value
+differences and lag classes are taken from the variogram once, thus no
+Variogram is built per replicate.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Literal
+import warnings
+
+import numpy as np
+import pandas as pd
+import skgstat as skg
+from scipy import sparse
+from scipy.cluster.vq import kmeans2
+from scipy.stats import norm
+
+from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.kriging import _n_workers
+from hydrobox.geostat.variogram import BATCH_MODELS, SHAPE_PARAMS, _fit_model
+
+
+def _pair_indices(variogram: skg.Variogram):
+    """
+    Point indices of the pairs in the order of the pairwise differences
+    """
+    if isinstance(variogram.distance_matrix, sparse.spmatrix):
+        # sparse distances keep the pairs of the upper triangle row by row
+        t = variogram.triangular_distance_matrix.tocsr()
+        return np.repeat(np.arange(t.shape[0]), np.diff(t.indptr)), t.indices
+    return np.triu_indices(len(variogram.values), k=1)
+
+
+def _init_worker(state):
+    global _WORKER_STATE
+    _WORKER_STATE = state
+
+
+def _replicate(tasks: list):
+    """
+    Estimate the experimental variogram and the model parameters of the
+    replicates. Each task is a seed of a bootstrap replicate, or the
+    cluster left out by a jackknife replicate.
+    """
+    s = _WORKER_STATE
+    n_lags = len(s['bins'])
+    experimental = np.full((len(tasks), n_lags), np.nan)
+    parameters = np.full((len(tasks), 3 + (s['model'] in SHAPE_PARAMS)), np.nan)
+
+    for r, task in enumerate(tasks):
+        if s['method'] == 'pair':
+            rng = np.random.default_rng(task)
+            for k, d in enumerate(s['diffs']):
+                if len(d) > 0:
+                    experimental[r, k] = s['estimator'](d[rng.integers(len(d), size=len(d))])
+        else:
+            # a pair is drawn as often as both of its points
+            if s['method'] == 'cluster':
+                rng = np.random.default_rng(task)
+                drawn = np.bincount(rng.integers(s['n_clusters'], size=s['n_clusters']), minlength=s['n_clusters'])
+            else:
+                drawn = (np.arange(s['n_clusters']) != task).astype(int)
+            weights = drawn[s['labels']]
+            for k, (d, i, j) in enumerate(zip(s['diffs'], s['i'], s['j'])):
+                resampled = np.repeat(d, weights[i] * weights[j])
+                if len(resampled) > 0:
+                    experimental[r, k] = s['estimator'](resampled)
+
+        observed = ~np.isnan(experimental[r])
+        if observed.sum() < s['n_params'] or np.nanmax(experimental[r]) <= 0:
+            continue
+        sigma = None if s['sigma'] is None else s['sigma'][observed]
+        cof, _ = _fit_model(s['model'], s['bins'][observed], experimental[r, observed], s['use_nugget'], s['fit_method'], sigma=sigma)
+        if cof is not None:
+            nugget = cof[-1] if s['use_nugget'] else 0.
+            parameters[r] = [cof[0], cof[1], nugget] + list(cof[2:3] if s['model'] in SHAPE_PARAMS else [])
+
+    return experimental, parameters
+
+
+def bootstrap(
+    variogram: skg.Variogram,
+    n_boot: int = 200,
+    method: Literal['pair', 'cluster', 'jackknife'] = 'pair',
+    n_clusters: int = None,
+    percentiles: List[float] = (2.5, 50, 97.5),
+    seed: int = None,
+    n_jobs: int = None,
+    return_type: Literal['describe', 'replicates', 'plot'] = 'describe',
+    plot_kwargs: dict = {}
+):
+    """
+    Bootstrap or jackknife confidence envelopes of the experimental
+    variogram and of the model parameters. The distances, value
+    differences and lag classes are taken from the variogram, which is
+    not changed. Each replicate only estimates the semi-variance of each
+    lag class from the resampled differences and fits the model.
+
+    The ``'pair'`` bootstrap resamples the pairs within each lag class.
+    It is fast, but ignores that the pairs share observations. The
+    ``'cluster'`` bootstrap resamples clusters of nearby observations
+    and keeps the pairs of the drawn observations, which preserves the
+    dependence of the pairs. The ``'jackknife'`` leaves out one cluster
+    per replicate and derives normal percentiles from the jackknife
+    standard error.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram, i.e. estimated by :func:`variogram <hydrobox.geostat.variogram>`.
+        Its estimator, model, use_nugget, fit_method and fit_sigma are
+        used for all replicates. Only the models of
+        :func:`fit_models <hydrobox.geostat.fit_models>` are supported.
+    n_boot : int
+        Number of bootstrap replicates. Defaults to 200. The jackknife
+        has one replicate per cluster.
+    method : str
+        ``'pair'`` (default), ``'cluster'`` or ``'jackknife'``.
+    n_clusters : int
+        Number of k-means clusters of the coordinates used by
+        ``'cluster'`` and ``'jackknife'``. If None (default), each
+        observation is a cluster of its own.
+    percentiles : list
+        Percentiles of the replicates, in percent.
+    seed : int
+        Seed of the replicates and the clustering. If None (default),
+        the replicates are not reproducible. Each replicate has its own
+        seed, thus the result does not depend on n_jobs.
+    n_jobs : int
+        Number of worker processes. If None (default), the replicates
+        are estimated in this process. Negative numbers follow the
+        joblib convention, i.e. ``-1`` uses all CPUs.
+    return_type : str
+        ``'describe'`` (default) returns the percentiles, ``'replicates'``
+        all replicates and ``'plot'`` a plot of the variogram with the
+        envelope of the lowest and highest percentile.
+    plot_kwargs : dict
+        Arguments passed to the plotting function.
+
+    Returns
+    -------
+    description : dict
+        If return_type is ``'describe'``. ``'experimental'`` holds a
+        DataFrame of the semi-variance percentiles, with one column per
+        lag class, and ``'parameters'`` a DataFrame of the parameter
+        percentiles. Both are indexed by the percentiles.
+    replicates : tuple
+        If return_type is ``'replicates'``. DataFrames of the experimental
+        variograms and of the parameters of all replicates.
+    fig : plotly.graph_objects.Figure, matplotlib.Figure
+        If return_type is ``'plot'``
+
+    """
+    if method not in ('pair', 'cluster', 'jackknife'):
+        raise ValueError("method '%s' not supported." % method)
+    if return_type not in ('describe', 'replicates', 'plot'):
+        raise ValueError("return_type '%s' not supported." % return_type)
+    model = variogram.model.__name__
+    if model not in BATCH_MODELS:
+        raise ValueError("model '%s' not supported." % model)
+
+    # the pairs of each lag class
+    bins = np.asarray(variogram.bins, dtype=float)
+    groups = variogram.lag_groups()
+    diffs = variogram.pairwise_diffs
+    i, j = _pair_indices(variogram)
+    classes = [np.flatnonzero(groups == k) for k in range(len(bins))]
+
+    # observations are clustered by their coordinates
+    seeds = np.random.SeedSequence(seed)
+    labels = None
+    if method != 'pair':
+        coords = np.asarray(variogram.coordinates, dtype=float)
+        if n_clusters is None or n_clusters >= len(coords):
+            labels = np.arange(len(coords))
+        else:
+            _, labels = kmeans2(coords, n_clusters, minit='++', seed=np.random.default_rng(seeds.spawn(1)[0]))
+        labels = np.unique(labels, return_inverse=True)[1]
+
+    sigma = variogram.fit_sigma
+    state = dict(
+        method=method,
+        estimator=variogram.estimator,
+        model=model,
+        use_nugget=variogram.use_nugget,
+        fit_method=variogram.fit_method,
+        sigma=None if sigma is None else np.asarray(sigma, dtype=float),
+        bins=bins,
+        n_params=2 + variogram.use_nugget + (model in SHAPE_PARAMS),
+        diffs=[diffs[c] for c in classes],
+        i=[i[c] for c in classes],
+        j=[j[c] for c in classes],
+        labels=labels,
+        n_clusters=None if labels is None else labels.max() + 1
+    )
+
+    # one independent seed per replicate, or one left out cluster
+    if method == 'jackknife':
+        tasks = list(range(state['n_clusters']))
+    else:
+        tasks = seeds.spawn(n_boot)
+
+    workers = _n_workers(n_jobs)
+    if workers == 1:
+        _init_worker(state)
+        experimental, parameters = _replicate(tasks)
+    else:
+        # use a few chunks of replicates per worker to balance the load
+        size = max(int(np.ceil(len(tasks) / (4 * workers))), 1)
+        chunks = [tasks[s:s + size] for s in range(0, len(tasks), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state, )) as pool:
+            results = list(pool.map(_replicate, chunks))
+        experimental = np.concatenate([r[0] for r in results])
+        parameters = np.concatenate([r[1] for r in results])
+
+    columns = ['effective_range', 'sill', 'nugget'] + ([SHAPE_PARAMS[model][0]] if model in SHAPE_PARAMS else [])
+    experimental = pd.DataFrame(experimental, columns=bins)
+    parameters = pd.DataFrame(parameters, columns=columns)
+    if return_type == 'replicates':
+        return experimental, parameters
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if method == 'jackknife':
+            # normal percentiles around the full sample estimate
+            n = len(tasks)
+            desc = variogram.describe()
+            full = np.concatenate((variogram.experimental, [desc[c] for c in columns]))
+            replicates = np.concatenate((experimental.values, parameters.values), axis=1)
+            se = np.sqrt((n - 1) / n * np.nansum((replicates - np.nanmean(replicates, axis=0))**2, axis=0))
+            q = full + norm.ppf(np.asarray(percentiles)[:, None] / 100.) * se
+        else:
+            q = np.nanpercentile(np.concatenate((experimental.values, parameters.values), axis=1), percentiles, axis=0)
+
+    index = pd.Index(percentiles, name='percentile')
+    envelope = pd.DataFrame(q[:, :len(bins)], index=index, columns=bins)
+    params = pd.DataFrame(q[:, len(bins):], index=index, columns=columns)
+
+    if return_type == 'plot':
+        pfunc = plot_function_loader('variogram')
+        return pfunc(
+            func_args=dict(variogram=variogram, plot_type='envelope', envelope=envelope),
+            plot_args=plot_kwargs
+        )
+
+    return dict(experimental=envelope, parameters=params)
@@ -0,0 +1,245 @@
+"""
+Caches for expensive geostatistical objects.
+
+The :data:`krige_cache` holds the most recently built
+:class:`Krige <gstools.Krige>` instances of the kriging functions.
+Building a Krige instance includes fitting the variogram and inverting
+the kriging matrix, which can be skipped whenever the same variogram
+is kriged again, i.e. at a new grid resolution or for another plot.
+
+The :data:`variogram_cache` holds the most recently estimated
+:class:`Variogram <skgstat.Variogram>` instances of
+:func:`variogram <hydrobox.geostat.variogram>`, if it is called with
+``cache=True``. Set its ``directory`` to keep the variograms on disk
+across processes.
+
+"""
+from typing import Any, Hashable, Literal
+from collections import OrderedDict
+import hashlib
+import pickle
+import os
+
+import numpy as np
+
+
+def content_hash(*objs: Any) -> str:
+    """
+    Hash the content of the given objects. Numpy arrays are hashed by
+    their data, shape and dtype, dicts by their sorted items and callables
+    by their qualified name. All other objects are hashed by their repr.
+    Lambdas and locally defined functions share their qualified name,
+    check the objects with :func:`cacheable` first.
+
+    Returns
+    -------
+    key : str
+        Hex digest of the content
+    """
+    h = hashlib.sha1()
+
+    def update(obj):
+        if isinstance(obj, np.ndarray):
+            h.update(str((obj.shape, obj.dtype.str)).encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, dict):
+            h.update(b'{')
+            for k in sorted(obj, key=str):
+                update(k)
+                update(obj[k])
+            h.update(b'}')
+        elif isinstance(obj, (list, tuple)):
+            h.update(b'[')
+            for o in obj:
+                update(o)
+            h.update(b']')
+        elif callable(obj):
+            h.update(('%s.%s' % (getattr(obj, '__module__', ''), getattr(obj, '__qualname__', repr(obj)))).encode())
+        else:
+            h.update(repr(obj).encode())
+        # separate consecutive objects
+        h.update(b'|')
+
+    for obj in objs:
+        update(obj)
+
+    return h.hexdigest()
+
+
+def cacheable(*objs: Any) -> bool:
+    """
+    Check, that all callables among the objects, also inside of dicts,
+    lists and tuples, can be told apart by :func:`content_hash`. This is
+    not the case for lambdas and locally defined functions, which share
+    their qualified name.
+    """
+    for obj in objs:
+        if isinstance(obj, dict):
+            if not cacheable(*obj.values()):
+                return False
+        elif isinstance(obj, (list, tuple)):
+            if not cacheable(*obj):
+                return False
+        elif callable(obj) and not isinstance(obj, np.ndarray):
+            qualname = getattr(obj, '__qualname__', None)
+            if qualname is None or '<lambda>' in qualname or '<locals>' in qualname:
+                return False
+    return True
+
+
+class LRUCache:
+    """
+    Cache with a size cap and an optional on-disk tier.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of objects held in memory. If the cache is full,
+        an object is evicted by the policy. A maxsize of ``0`` disables
+        the in-memory cache.
+    policy : str
+        Eviction policy. ``'lru'`` (default) evicts the least recently
+        used object, ``'lfu'`` the least frequently used and ``'fifo'``
+        the oldest object.
+    directory : str
+        If given, every cached object is also pickled to this directory
+        and loaded from there on a miss in memory, i.e. after a restart
+        of the process. The disk tier is not bounded. Only string keys
+        are written to disk.
+
+    """
+    def __init__(self, maxsize: int = 8, policy: Literal['lru', 'lfu', 'fifo'] = 'lru', directory: str = None):
+        if policy not in ('lru', 'lfu', 'fifo'):
+            raise ValueError("policy has to be one of ['lru', 'lfu', 'fifo']")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.directory = directory
+        self._data = OrderedDict()
+        self._uses = dict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: Hashable) -> str:
+        if self.directory is None or not isinstance(key, str):
+            return None
+        return os.path.join(self.directory, '%s.pkl' % key)
+
+    def _store(self, key: Hashable, value: Any):
+        """
+        Put the object into memory and evict objects exceeding maxsize
+        """
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._uses[key] = self._uses.get(key, 0) + 1
+        if self.policy == 'lru':
+            self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            if self.policy == 'lfu':
+                # the least used object, the oldest one on ties
+                victim = min(self._data, key=lambda k: self._uses[k])
+            else:
+                victim = next(iter(self._data))
+            del self._data[victim]
+            del self._uses[victim]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached object for key and mark it as used.
+        Counts a hit, a disk hit or a miss.
+        """
+        if key in self._data:
+            self.hits += 1
+            self._uses[key] += 1
+            if self.policy == 'lru':
+                self._data.move_to_end(key)
+            return self._data[key]
+
+        # try the disk tier
+        path = self._path(key)
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self._store(key, value)
+                return value
+
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Cache the object under key and evict the objects exceeding
+        maxsize. If the cache has a directory, the object is pickled.
+        """
+        self._store(key, value)
+
+        path = self._path(key)
+        if path is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first, so that readers never see half a pickle
+            tmp = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+
+    def clear(self, disk: bool = False):
+        """
+        Remove all objects and reset the hit and miss counters.
+
+        Parameters
+        ----------
+        disk : bool
+            If True, the pickled objects in directory are removed as well.
+        """
+        self._data.clear()
+        self._uses.clear()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk and self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def info(self) -> dict:
+        """
+        Cache statistics
+
+        Returns
+        -------
+        info : dict
+            Hits, disk hits, misses, the hit rate, maxsize, current size,
+            policy and directory of the cache.
+        """
+        calls = self.hits + self.disk_hits + self.misses
+        return dict(
+            hits=self.hits,
+            disk_hits=self.disk_hits,
+            misses=self.misses,
+            hit_rate=(self.hits + self.disk_hits) / calls if calls > 0 else 0.,
+            maxsize=self.maxsize,
+            currsize=len(self._data),
+            policy=self.policy,
+            directory=self.directory
+        )
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# cache of built gstools Krige instances
+krige_cache = LRUCache(maxsize=8)
+
+# cache of built skgstat Variogram instances
+variogram_cache = LRUCache(maxsize=16)
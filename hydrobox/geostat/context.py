@@ -0,0 +1,190 @@
+"""
+Shared point pairs of several variograms.
+
+Comparing estimators, models or bin functions of one sample only changes
+the binning and fitting of the variogram. The pairwise distances and
+value differences stay the same. A :class:`PairContext` calculates them
+once and shares them with all variograms built from it.
+"""
+from typing import Union, Literal
+
+import numpy as np
+import skgstat as skg
+
+from hydrobox.geostat.sampling import _sparse_metric_space
+
+
+class _ContextVariogram(skg.Variogram):
+    """
+    Variogram, that takes the distances and value differences from a
+    PairContext. Both are calculated by the first variogram of the
+    context and reused by all others.
+    """
+    def __init__(self, context: 'PairContext', **kwargs):
+        # set before the Variogram init, as it calculates the differences
+        self._pair_context = context
+        super(_ContextVariogram, self).__init__(
+            coordinates=context.metric_space,
+            values=context.values,
+            dist_func=context.dist_func,
+            **kwargs
+        )
+
+    def _shares_values(self) -> bool:
+        ctx = self._pair_context
+        return not self._is_cross and not self._is_aggregate and np.array_equal(self.values, ctx.values)
+
+    @property
+    def distance(self):
+        ctx = self._pair_context
+        if self._X is not ctx.metric_space:
+            return super(_ContextVariogram, self).distance
+        if ctx._distance is None:
+            ctx._distance = super(_ContextVariogram, self).distance
+        return ctx._distance
+
+    def lag_classes(self):
+        """
+        Iterate over the lag classes. The pairs of the context are sorted
+        by distance once, thus each lag class is a slice of the sorted
+        differences. The order of the differences within a lag class
+        differs from :meth:`Variogram.lag_classes <skgstat.Variogram.lag_classes>`.
+        """
+        if self._X is not self._pair_context.metric_space or not self._shares_values():
+            yield from super(_ContextVariogram, self).lag_classes()
+            return
+
+        distance, diffs = self._pair_context._sorted_pairs(self)
+        ends = np.searchsorted(distance, self.bins, side='left')
+        starts = np.concatenate(([0], ends[:-1]))
+        for start, end in zip(starts, ends):
+            yield diffs[start:end]
+
+    def _calc_diff(self, force=False):
+        if not self._shares_values():
+            return super(_ContextVariogram, self)._calc_diff(force=force)
+        if self._diff is not None and not force:
+            return
+
+        ctx = self._pair_context
+        if ctx._diff is None:
+            super(_ContextVariogram, self)._calc_diff(force=True)
+            ctx._diff = self._diff
+        else:
+            self._diff = ctx._diff
+
+
+class PairContext:
+    """
+    Point pairs of a sample, shared by several variograms. The distances
+    and value differences are calculated by the first variogram and
+    reused by all other variograms of the context, so that only the
+    binning and fitting is done per variogram. Copies of the context,
+    i.e. by :func:`copy.deepcopy`, are the context itself. Pass the context to
+    :func:`variogram <hydrobox.geostat.variogram>` or
+    :func:`gridsearch <hydrobox.geostat.gridsearch>`.
+
+    Parameters
+    ----------
+    coordinates : numpy.ndarray
+        Array of coordinates
+    values : numpy.ndarray
+        One dimensional array of observations
+    dist_func : str
+        Distance function of the coordinates
+    maxlag : float
+        Maximum lag of the sparse distances. Only used with
+        ``distance_backend='kdtree'`` or n_pairs. A relative maxlag
+        is resolved to the absolute maxlag on construction.
+    distance_backend : str
+        ``'dense'`` (default) or ``'kdtree'`` for sparse distances
+        within maxlag. Refer to :func:`variogram <hydrobox.geostat.variogram>`.
+    n_pairs : int
+        If given, the pairs are sampled. Refer to
+        :func:`variogram <hydrobox.geostat.variogram>`.
+    n_lags : int
+        Number of lag classes used to stratify the sampled pairs.
+    seed : int
+        Seed of the pair sampling.
+
+    Examples
+    --------
+    >>> ctx = PairContext(coordinates, values)
+    >>> for model in ('spherical', 'exponential', 'gaussian'):
+    ...     print(variogram(context=ctx, model=model).rmse)
+
+    """
+    def __init__(
+        self,
+        coordinates: np.ndarray,
+        values: np.ndarray,
+        dist_func: str = 'euclidean',
+        maxlag: Union[None, str, float] = None,
+        distance_backend: Literal['dense', 'kdtree'] = 'dense',
+        n_pairs: int = None,
+        n_lags: int = 10,
+        seed: int = None
+    ):
+        self.values = np.asarray(values, dtype=float)
+        if self.values.ndim != 1:
+            raise ValueError('A PairContext needs one dimensional values.')
+        self.dist_func = dist_func
+
+        if n_pairs is not None or distance_backend == 'kdtree':
+            self.metric_space, self.maxlag = _sparse_metric_space(
+                coordinates,
+                dist_func=dist_func,
+                maxlag=maxlag,
+                n_lags=n_lags,
+                n_pairs=n_pairs,
+                seed=seed
+            )
+        else:
+            # skgstat handles 1D coordinates like points on a line
+            coordinates = np.asarray(coordinates, dtype=float)
+            if coordinates.ndim < 2:
+                coordinates = np.column_stack((coordinates, np.zeros(len(coordinates))))
+            self.metric_space = skg.MetricSpace(coordinates, dist_func)
+            self.maxlag = None
+
+        self._distance = None
+        self._diff = None
+        self._sorted = None
+
+    def __deepcopy__(self, memo):
+        # the context is shared, i.e. by the estimators cloned by a gridsearch
+        return self
+
+    def _prepare(self):
+        """
+        Calculate the distances and value differences of the context, i.e.
+        before it is sent to worker processes
+        """
+        if self._sorted is None:
+            self._sorted_pairs(_ContextVariogram(self, maxlag=self.maxlag, fit_method=None))
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        return self.metric_space.coords
+
+    def _sorted_pairs(self, variogram: skg.Variogram):
+        """
+        Distances and value differences of the pairs sorted by distance
+        """
+        if self._sorted is None:
+            distance = variogram.distance
+            order = np.argsort(distance, kind='stable')
+            self._sorted = (distance[order], variogram.pairwise_diffs[order])
+        return self._sorted
+
+    def variogram(self, **kwargs) -> skg.Variogram:
+        """
+        Build a Variogram of the context. The keyword arguments are passed
+        to :class:`Variogram <skgstat.Variogram>`. The maxlag defaults to
+        the maxlag of sparse distances.
+        """
+        if kwargs.get('maxlag') is None:
+            kwargs['maxlag'] = self.maxlag
+        if kwargs.pop('dist_func', self.dist_func) != self.dist_func:
+            raise ValueError('The dist_func of the context is %s.' % self.dist_func)
+        return _ContextVariogram(self, **kwargs)
@@ -0,0 +1,111 @@
+from typing import Union, Literal, Dict
+import numpy as np
+import skgstat as skg
+
+from hydrobox.geostat.kriging import _get_krige
+
+
+def cross_validation(
+    variogram: skg.Variogram,
+    exact: bool = True,
+    cond_err: Union[Literal['nugget'], float, list] = 'nugget',
+    pseudo_inv: bool = True,
+    pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
+    cache: bool = True,
+    return_type: Literal['describe', 'residuals', 'rmse', 'mse', 'mae'] = 'describe'
+) -> Union[Dict[str, float], np.ndarray, float]:
+    """
+    Leave-one-out cross-validation of ordinary kriging with the given
+    :class:`Variogram <skgstat.Variogram>`.
+
+    Instead of solving one kriging system per left-out observation,
+    all residuals are derived at once from the inverted kriging matrix
+    :math:`A^{-1}`, which is built only once. The residual of the i-th
+    observation is given by [1]_:
+
+    .. math::
+        z_i - \\hat{z}_{-i} = \\frac{(A^{-1} z)_i}{(A^{-1})_{ii}}
+
+    and the leave-one-out kriging variance by :math:`1 / (A^{-1})_{ii}`.
+    The kriging system is taken from the same cache as
+    :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`,
+    unless cache is False.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    exact : bool
+        If True (default), the input data will be matched exactly.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    cond_err : str, float, list
+        Measurement error, or variogram nugget.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv : bool
+        If True, the Kriging is more robust, but also slower.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv_type : str
+        Type of matrix inversion used if pseudo_inv is True.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    cache : bool
+        If True (default), the kriging system is looked up in, and added
+        to the ``krige_cache``. Set to False for throw-away variograms,
+        i.e. the candidates of a grid search, to keep the cached systems.
+    return_type : str
+        ``'describe'`` returns a dictionary of the scores, the residuals
+        and the leave-one-out kriging variances. ``'residuals'`` returns
+        only the residuals. ``'rmse'``, ``'mse'`` or ``'mae'`` return
+        only the respective score.
+
+    Returns
+    -------
+    description : dict
+        If return_type is ``'describe'``
+    residuals : numpy.ndarray
+        Observation minus leave-one-out estimation,
+        if return_type is ``'residuals'``
+    score : float
+        If return_type is one of the scores
+
+    References
+    ----------
+    .. [1] Dubrule, O. (1983): Cross validation of kriging in a unique
+        neighborhood. Mathematical Geology, 15, 687-699.
+
+    """
+    args = dict(
+        exact=exact,
+        cond_err=cond_err,
+        pseudo_inv=pseudo_inv,
+        pseudo_inv_type=pseudo_inv_type
+    )
+    krige = _get_krige(variogram, **args) if cache else variogram.to_gs_krige(**args)
+    n = krige.cond_no
+
+    # inverted kriging matrix and the padded conditions
+    krige_mat = krige._krige_mat
+    diag = np.diag(krige_mat)[:n]
+    residuals = (krige_mat @ krige._krige_cond)[:n] / diag
+
+    scores = dict(
+        rmse=float(np.sqrt(np.mean(residuals**2))),
+        mse=float(np.mean(residuals**2)),
+        mae=float(np.mean(np.abs(residuals)))
+    )
+
+    if return_type == 'describe':
+        return dict(
+            **scores,
+            residuals=residuals,
+            variance=1 / diag
+        )
+    elif return_type == 'residuals':
+        return residuals
+    elif return_type in scores:
+        return scores[return_type]
+    else:
+        raise ValueError("return_type '%s' not supported." % return_type)
@@ -0,0 +1,217 @@
+from typing import List, Tuple, Union, Sequence
+import numpy as np
+
+
+class Grid:
+    """
+    Specification of a regular interpolation grid.
+
+    The grid is defined by a bounding box and a cell size per axis. The
+    grid points are the cell centers. An optional boolean mask marks the
+    active cells, i.e. the cells inside a catchment. Only the active
+    cells will be interpolated, all other cells are NaN in the result.
+
+    Parameters
+    ----------
+    bbox : list
+        One ``(lower, upper)`` tuple per axis.
+    cell_size : float, list
+        Cell size used for all axes or one cell size per axis. If the
+        cell size does not divide the bbox, the upper bound is extended.
+    mask : numpy.ndarray
+        Boolean array of the grid shape. True marks an active cell.
+        If None (default), all cells are active.
+
+    Examples
+    --------
+    A 100 by 50 grid with a cell size of 10:
+
+    >>> grid = Grid([(0, 1000), (0, 500)], 10)
+    >>> grid.shape
+    (100, 50)
+
+    """
+    def __init__(
+        self,
+        bbox: Sequence[Tuple[float, float]],
+        cell_size: Union[float, Sequence[float]],
+        mask: np.ndarray = None
+    ):
+        self.bbox = [(float(l), float(u)) for l, u in bbox]
+        self.cell_size = [float(c) for c in np.broadcast_to(cell_size, (len(self.bbox), ))]
+
+        if any(c <= 0 for c in self.cell_size):
+            raise ValueError('cell_size has to be positive.')
+        if any(u < l for l, u in self.bbox):
+            raise ValueError('The upper bounds of the bbox have to be larger than the lower bounds.')
+
+        # build the axes of cell centers
+        self.axes = []
+        for (lower, upper), cell in zip(self.bbox, self.cell_size):
+            n = max(int(np.ceil(np.round((upper - lower) / cell, 9))), 1)
+            self.axes.append(lower + (np.arange(n) + 0.5) * cell)
+
+        self._mask = None
+        self._active = None
+        self.mask = mask
+
+    @classmethod
+    def from_resolution(cls, coordinates: np.ndarray, resolution: int) -> 'Grid':
+        """
+        Grid of ``resolution`` points per axis, spanning from the smallest
+        to the largest coordinate. This is the grid used, if an integer is
+        passed as grid_resolution to the kriging functions.
+
+        Parameters
+        ----------
+        coordinates : numpy.ndarray
+            Array of coordinates of shape ``(n_points, n_dims)``
+        resolution : int
+            Number of grid points per axis
+
+        Returns
+        -------
+        grid : Grid
+
+        Notes
+        -----
+        The axes match ``np.linspace(lower, upper, resolution)``. An axis
+        without extent, i.e. a transect of constant y, or a resolution
+        of 1 cannot be described by a positive cell size. Their cells
+        are stacked on the lower coordinate, with a cell size of 0.
+        """
+        lower = np.min(coordinates, axis=0)
+        upper = np.max(coordinates, axis=0)
+        cell_size = (upper - lower) / max(resolution - 1, 1)
+        degenerate = (cell_size <= 0) | (resolution == 1)
+
+        # the outermost cell centers are on the outermost coordinates
+        cell_size = np.where(degenerate, 1., cell_size)
+        bbox = [(l - c / 2, l + (resolution - 0.5) * c) for l, c in zip(lower, cell_size)]
+        grid = cls(bbox, cell_size)
+
+        for i in np.flatnonzero(degenerate):
+            grid.axes[i] = np.full(resolution, lower[i], dtype=float)
+            grid.bbox[i] = (float(lower[i]), float(lower[i]))
+            grid.cell_size[i] = 0.
+        return grid
+
+    @classmethod
+    def from_polygon(
+        cls,
+        polygon: np.ndarray,
+        cell_size: Union[float, Sequence[float]],
+        bbox: Sequence[Tuple[float, float]] = None
+    ) -> 'Grid':
+        """
+        2D grid masked by a polygon, i.e. the outline of a catchment.
+        Cells are active, if their center is inside the polygon.
+
+        Parameters
+        ----------
+        polygon : numpy.ndarray
+            Array of shape ``(n_vertices, 2)`` of the polygon outline.
+        cell_size : float, list
+            Cell size of the grid
+        bbox : list
+            Bounding box of the grid. Defaults to the bounding box of
+            the polygon.
+
+        Returns
+        -------
+        grid : Grid
+        """
+        polygon = np.asarray(polygon, dtype=float)
+        if bbox is None:
+            bbox = list(zip(polygon.min(axis=0), polygon.max(axis=0)))
+
+        grid = cls(bbox, cell_size)
+        grid.mask = grid.polygon_mask(polygon)
+        return grid
+
+    @property
+    def ndim(self) -> int:
+        return len(self.axes)
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(len(a) for a in self.axes)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def mask(self) -> np.ndarray:
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask: np.ndarray):
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool)
+            if mask.shape != self.shape:
+                raise ValueError('mask has shape %s, but the grid has shape %s' % (mask.shape, self.shape))
+        self._mask = mask
+        self._active = None
+
+    @property
+    def active(self) -> np.ndarray:
+        """
+        Flat indices of the active cells. None, if there is no mask.
+        """
+        if self._mask is None:
+            return None
+        if self._active is None:
+            self._active = np.flatnonzero(self._mask)
+        return self._active
+
+    @property
+    def n_active(self) -> int:
+        """
+        Number of active cells
+        """
+        return self.size if self._mask is None else len(self.active)
+
+    def cells(self, block: slice) -> Union[slice, np.ndarray]:
+        """
+        Flat indices of the given block of active cells. If there is
+        no mask, the block is also a slice of the flat grid.
+        """
+        if self._mask is None:
+            return block
+        return self.active[block]
+
+    def positions(self, cells: Union[slice, np.ndarray]) -> List[np.ndarray]:
+        """
+        Coordinates of the given flat cell indices, one array per axis
+        """
+        if isinstance(cells, slice):
+            cells = np.arange(cells.start or 0, self.size if cells.stop is None else cells.stop)
+        idx = np.unravel_index(cells, self.shape)
+        return [a[i] for a, i in zip(self.axes, idx)]
+
+    def polygon_mask(self, polygon: np.ndarray) -> np.ndarray:
+        """
+        Boolean array of the grid shape, which is True for all cells
+        with their center inside the polygon. Only 2D grids are supported.
+
+        Parameters
+        ----------
+        polygon : numpy.ndarray
+            Array of shape ``(n_vertices, 2)`` of the polygon outline.
+
+        Returns
+        -------
+        mask : numpy.ndarray
+        """
+        if self.ndim != 2:
+            raise ValueError('Polygons can only be used on 2D grids.')
+        from matplotlib.path import Path
+
+        xx, yy = np.meshgrid(*self.axes, indexing='ij')
+        points = np.column_stack((xx.ravel(), yy.ravel()))
+        inside = Path(np.asarray(polygon, dtype=float)).contains_points(points)
+        return inside.reshape(self.shape)
+
+    def __repr__(self):
+        return 'Grid(shape=%s, active=%d)' % (self.shape, self.n_active)
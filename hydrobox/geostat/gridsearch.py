@@ -3,6 +3,93 @@ import skgstat as skg
 from sklearn.model_selection import GridSearchCV
 import numpy as np
 
+from hydrobox.geostat.cross_validation import cross_validation
+from hydrobox.geostat.context import PairContext
+
+
+class _FastCVEstimator(skg.interfaces.VariogramEstimator):
+    """
+    VariogramEstimator, that scores the closed-form leave-one-out
+    cross-validation of :func:`cross_validation <hydrobox.geostat.cross_validation>`
+    """
+    def score(self, X=None, y=None):
+        if self.cross_validate:
+            return cross_validation(self.variogram, cache=False, return_type=self.use_score)
+        return super(_FastCVEstimator, self).score(X, y)
+
+
+class _ContextEstimator(skg.interfaces.VariogramEstimator):
+    """
+    VariogramEstimator, that builds the variograms from a PairContext.
+    The context holds the point pairs of all observations, thus the
+    estimator is always fitted to the full sample.
+    """
+    def __init__(
+        self,
+        context: PairContext = None,
+        estimator='matheron',
+        model='spherical',
+        dist_func='euclidean',
+        bin_func='even',
+        normalize=True,
+        fit_method='trf',
+        fit_sigma=None,
+        use_nugget=False,
+        maxlag=None,
+        n_lags=10,
+        verbose=False,
+        use_score='rmse',
+        cross_validate=False,
+        cv_method='jacknife'
+    ):
+        super(_ContextEstimator, self).__init__(
+            estimator=estimator,
+            model=model,
+            dist_func=dist_func,
+            bin_func=bin_func,
+            normalize=normalize,
+            fit_method=fit_method,
+            fit_sigma=fit_sigma,
+            use_nugget=use_nugget,
+            maxlag=maxlag,
+            n_lags=n_lags,
+            verbose=verbose,
+            use_score=use_score,
+            cross_validate=cross_validate
+        )
+        self.context = context
+        self.cv_method = cv_method
+
+    def fit(self, X=None, y=None):
+        self.variogram = self.context.variogram(
+            estimator=self.estimator,
+            model=self.model,
+            dist_func=self.dist_func,
+            bin_func=self.bin_func,
+            normalize=self.normalize,
+            fit_method=self.fit_method,
+            fit_sigma=self.fit_sigma,
+            use_nugget=self.use_nugget,
+            maxlag=self.maxlag,
+            n_lags=self.n_lags
+        )
+        self.X_ = self.context.coordinates
+        self.y_ = self.context.values
+
+        # get the fitted model function and parameters
+        self._model_func_ = self.variogram.fitted_model
+        d = self.variogram.describe()
+        self.range_ = d['effective_range']
+        self.sill_ = d['sill']
+        self.nugget_ = d['nugget']
+
+        return self
+
+    def score(self, X=None, y=None):
+        if self.cross_validate and self.cv_method == 'fast':
+            return cross_validation(self.variogram, cache=False, return_type=self.use_score)
+        return super(_ContextEstimator, self).score(X, y)
+
 
 def gridsearch(
     param_grid: Dict[str, Tuple],
@@ -11,7 +98,9 @@ def gridsearch(
     values: np.ndarray = None,
     score: Literal['rmse', 'mse', 'mae'] = 'rmse',
     cross_validate: bool = True,
+    cv_method: Literal['jacknife', 'fast'] = 'jacknife',
     n_jobs=-1,
+    context: PairContext = None,
     return_type: Literal['object', 'best_param'] = 'object',
     **kwargs
 ) -> Dict[str, Any]:
@@ -46,8 +135,21 @@ def gridsearch(
         If False, the model fit to the experimental variogra, will be scored.
         .. note:: 
             Needs at least `scikit-gstat>=0.5.4`.
+    cv_method : str
+        Method used if cross_validate is True. ``'jacknife'`` (default)
+        uses the cross-validation of scikit-gstat, which solves one
+        kriging system per observation. ``'fast'`` uses
+        :func:`cross_validation <hydrobox.geostat.cross_validation>`,
+        which derives all leave-one-out residuals from a single
+        kriging system.
     n_jobs : int
         Will be passed down to :class:`GridSearchCV <sklearn.model_selection.GridSearchCV>`
+    context : hydrobox.geostat.PairContext
+        If given, all variograms are built from the distances and value
+        differences of the context, which are calculated only once. Each
+        parameter set is then fitted to the full sample, instead of five
+        cross-validation folds of the sample. Coordinates, values and a
+        variogram are ignored.
     return_type : str
         Either `'object'`, to return the GridSerachCV object or
         `'best_param'` to return a dictionary of the best params.
@@ -72,11 +174,31 @@ def gridsearch(
     sklearn.model_selection.GridSearchCV
 
     """
-    if variogram is None and (coordinates is None or values is None):
+    if context is None and variogram is None and (coordinates is None or values is None):
         raise AttributeError('Either a Variogram or the coorinates, values and kwargs needs to be set')
     
+    # the point pairs of the context are shared by all parameter sets
+    if context is not None:
+        estimator = _ContextEstimator(
+            context=context,
+            use_score=score,
+            cross_validate=cross_validate,
+            cv_method=cv_method,
+            **kwargs
+        )
+        # the workers of the gridsearch receive the calculated pairs
+        context._prepare()
+        idx = np.arange(len(context.values))
+        gs = GridSearchCV(estimator, param_grid, cv=[(idx, idx)], n_jobs=n_jobs)
+        gs_fit = gs.fit(context.coordinates, context.values)
+
+        if return_type.lower() == 'object':
+            return gs_fit
+        elif return_type.lower() == 'best_param':
+            return gs_fit.best_params_
+
     # extract the parameters
-    if variogram is not None:
+    elif variogram is not None:
         coordinates = variogram.coordinates
         values = variogram.values
         kwargs.update(variogram.describe().get('params'))
@@ -87,7 +209,11 @@ def gridsearch(
         kwargs['cross_validate'] = cross_validate
 
     # initialize the estimator
-    estimator = skg.interfaces.VariogramEstimator(
+    if cross_validate and cv_method == 'fast':
+        Estimator = _FastCVEstimator
+    else:
+        Estimator = skg.interfaces.VariogramEstimator
+    estimator = Estimator(
         use_score=score,
         **kwargs
     )
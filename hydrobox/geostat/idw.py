@@ -0,0 +1,204 @@
+"""
+Inverse distance weighting.
+
+IDW is a fast deterministic baseline to kriging. Each target point is
+interpolated from its nearest observations, found with a KD-tree, and
+weighted by the inverse distance to the power of ``power``.
+"""
+from typing import List, Union, Literal
+
+import numpy as np
+import skgstat as skg
+import plotly.graph_objects as go
+from scipy.spatial import cKDTree
+
+from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.kriging import _build_grid, _block_size, _allocate, _finalize, _run_blocks
+
+
+class IDW:
+    """
+    Callable, that interpolates target points by inverse distance
+    weighting. It mimics the call signature of
+    :class:`Krige <gstools.Krige>`, so that the grid is interpolated
+    block by block like kriging.
+
+    Parameters
+    ----------
+    coordinates : numpy.ndarray, skgstat.Variogram
+        Coordinates of the observations. If a
+        :class:`Variogram <skgstat.Variogram>` is given, its coordinates
+        and values are interpolated.
+    values : numpy.ndarray
+        Observations to interpolate. Mandatory, if coordinates is not
+        a Variogram.
+    n_neighbours : int
+        Number of nearest observations used per target point.
+        If None, all observations are used.
+    power : float
+        Power of the inverse distance.
+    search_radius : float
+        Maximum distance of the used observations. Target points
+        without observations in the radius are NaN.
+
+    """
+    # IDW has no external drift
+    ext_drift_no = 0
+
+    def __init__(
+        self,
+        coordinates: Union[np.ndarray, skg.Variogram],
+        values: np.ndarray = None,
+        n_neighbours: int = 12,
+        power: float = 2.,
+        search_radius: float = None
+    ):
+        if isinstance(coordinates, skg.Variogram):
+            coordinates, values = coordinates.coordinates, coordinates.values
+        elif values is None:
+            raise AttributeError('Either a Variogram or the coordinates and values are needed.')
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        if self.coordinates.ndim == 1:
+            self.coordinates = self.coordinates.reshape(-1, 1)
+        self.values = np.asarray(values, dtype=float)
+        if len(self.values) != len(self.coordinates):
+            raise ValueError('Got %d values for %d coordinates.' % (len(self.values), len(self.coordinates)))
+        self.n_neighbours = len(self.values) if n_neighbours is None else min(int(n_neighbours), len(self.values))
+        self.power = power
+        self.search_radius = np.inf if search_radius is None else search_radius
+        self.tree = cKDTree(self.coordinates)
+
+    @property
+    def krige_size(self) -> int:
+        return self.n_neighbours
+
+    def __call__(
+        self,
+        pos: List[np.ndarray],
+        mesh_type: str = 'unstructured',
+        ext_drift: np.ndarray = None,
+        return_var: bool = False,
+        store: bool = False
+    ) -> np.ndarray:
+        if mesh_type != 'unstructured':
+            raise ValueError('IDW only supports unstructured positions.')
+        if return_var:
+            raise ValueError('IDW has no estimation variance.')
+
+        points = np.column_stack(pos)
+        dist, idx = self.tree.query(points, k=self.n_neighbours, distance_upper_bound=self.search_radius)
+        dist, idx = dist.reshape(len(points), -1), idx.reshape(len(points), -1)
+
+        # missing neighbours are returned with infinite distance
+        valid = np.isfinite(dist)
+        values = self.values[np.where(valid, idx, 0)]
+
+        with np.errstate(divide='ignore'):
+            weights = np.where(valid, dist**-self.power, 0.)
+
+        # targets on an observation take its value
+        exact = dist[:, 0] == 0
+        weights[exact] = 0.
+        weights[exact, 0] = 1.
+
+        with np.errstate(invalid='ignore'):
+            return np.sum(weights * values, axis=1) / np.sum(weights, axis=1)
+
+
+def inverse_distance(
+    variogram: Union[skg.Variogram, np.ndarray],
+    grid_resolution: Union[int, Grid],
+    values: np.ndarray = None,
+    n_neighbours: int = 12,
+    power: float = 2.,
+    search_radius: float = None,
+    return_type: Literal['plot', 'grid'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    **kwargs
+) -> Union[List[np.ndarray], go.Figure]:
+    """
+    Interpolate observations by inverse distance weighting. The
+    interpolation follows the grid, return_type and plot conventions of
+    :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`, but does
+    not estimate an interpolation error. IDW needs no variogram, thus the
+    observations can be passed as coordinates and values, which saves
+    the distance matrix and the model fit of a Variogram.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram, numpy.ndarray
+        Variogram of the observations to interpolate. Only its
+        coordinates and values are used. Alternatively, the coordinates
+        of the observations.
+    grid_resolution : int, hydrobox.geostat.Grid
+        If an integer is passed, a grid of this resolution spanning the
+        observations is used. A :class:`Grid <hydrobox.geostat.Grid>`
+        can be used to set the bounding box, cell size and a mask.
+    values : numpy.ndarray
+        Observations to interpolate. Mandatory, if variogram is an
+        array of coordinates.
+    n_neighbours : int
+        Number of nearest observations used per cell. If None, all
+        observations are used. Defaults to 12.
+    power : float
+        Power of the inverse distance. Defaults to 2.
+    search_radius : float
+        Maximum distance of the used observations. Cells without
+        observations in the radius are NaN.
+    return_type : str
+        Return the interpolated grid (``'grid'``) or a plot of it
+        (``'plot'``). The grid is returned along with None in place of
+        the kriging error grid.
+    max_memory : float
+        Maximum memory in MB used to interpolate a block of cells.
+        If None (default), all cells are interpolated at once.
+    n_jobs : int
+        Number of worker processes interpolating the blocks. If None
+        (default), the grid is interpolated in this process. Negative
+        numbers follow the joblib convention, i.e. ``-1`` uses all CPUs.
+    output_dir : str
+        If given, the grid is written to ``field.npy`` in this directory
+        and returned as a read-only memory map.
+    kwargs :
+        Arguments passed to the plotting function.
+
+    Returns
+    -------
+    grids : tuple
+        If return_type is ``'grid'``. The interpolated grid and None.
+    fig : plotly.graph_objects.Figure, matplotlib.Figure
+        If return_type is ``'plot'``. Figure of the interpolated grid.
+
+    Raises
+    ------
+    AttributeError :
+        if coordinates are given without values, or the grid_resolution
+        is neither an integer nor a Grid
+
+    """
+    idw = IDW(variogram, values, n_neighbours=n_neighbours, power=power, search_radius=search_radius)
+
+    # build the grid - masked cells will be NaN
+    grid = _build_grid(idw.coordinates, grid_resolution)
+    fill = None if grid.mask is None else np.nan
+    field = _allocate(grid.shape, output_dir, 'field', fill=fill)
+
+    block_size = _block_size(idw.krige_size, max_memory, grid.n_active)
+    _run_blocks(idw, grid, field.reshape(-1), None, block_size, n_jobs=n_jobs)
+    field = _finalize(field)
+
+    if return_type == 'grid':
+        return (field, None)
+
+    # return the plot
+    if field.ndim > 2:
+        raise ValueError('Plotting not supported for dim > 2.')
+
+    pfunc = plot_function_loader('kriging')
+    return pfunc(
+        func_args=dict(variogram=variogram, field=field, sigma=None),
+        plot_args=kwargs
+    )
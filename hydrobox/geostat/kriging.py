@@ -1,37 +1,304 @@
-from typing import List, Union, Literal
+from typing import List, Union, Literal, Callable
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import os
 import numpy as np
 import skgstat as skg
+import gstools as gs
 import plotly.graph_objects as go
 
 from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.cache import krige_cache, content_hash
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.local import LocalKrige
+
+def _build_grid(variogram: Union[skg.Variogram, np.ndarray], grid_resolution: Union[int, Grid]) -> Grid:
+    """
+    Build the interpolation grid spanning the observations of the
+    variogram, or the given coordinate array
+    """
+    coordinates = variogram.coordinates if isinstance(variogram, skg.Variogram) else np.asarray(variogram)
+    dim = 1 if coordinates.ndim == 1 else coordinates.shape[1]
+    if isinstance(grid_resolution, Grid):
+        if grid_resolution.ndim != dim:
+            raise ValueError('The grid has %d dimensions, but the variogram %d.' % (grid_resolution.ndim, dim))
+        return grid_resolution
+    elif isinstance(grid_resolution, (int, np.integer)):
+        return Grid.from_resolution(coordinates, int(grid_resolution))
+    else:
+        raise AttributeError('grid_resolution has to be an integer or a hydrobox.geostat.Grid.')
+
+
+def _block_size(krige_size: int, max_memory: float = None, n_points: int = None, n_fields: int = 0) -> int:
+    """
+    Number of grid points that can be kriged at once, without exceeding
+    max_memory (in MB). The estimate accounts for the distance matrix, the
+    covariance and the right-hand side of the kriging system, which gstools
+    holds in memory for every target point, and n_fields output values.
+    """
+    if max_memory is None:
+        return n_points
+
+    # 8 bytes per float64, four arrays of size krige_size per point
+    per_point = 8 * (4 * krige_size + n_fields)
+    size = int(max_memory * 1024**2 // per_point)
+
+    if size < 1:
+        raise ValueError('max_memory=%s MB is too small to krige a single point.' % max_memory)
+
+    return size if n_points is None else min(size, n_points)
+
+
+def _iter_blocks(n_points: int, block_size: int):
+    """
+    Yield slices over the flattened grid of at most block_size points
+    """
+    for start in range(0, n_points, block_size):
+        yield slice(start, min(start + block_size, n_points))
+
+
+def _allocate(shape: tuple, output_dir: str = None, name: str = 'field', fill: float = None) -> np.ndarray:
+    """
+    Preallocate an output array. If output_dir is given, the array is
+    a memory-mapped ``.npy`` file in that directory. If fill is given,
+    the array is initialized with that value.
+    """
+    if output_dir is None:
+        arr = np.empty(shape, dtype=float)
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        arr = np.lib.format.open_memmap(
+            os.path.join(output_dir, '%s.npy' % name),
+            mode='w+',
+            dtype=float,
+            shape=shape
+        )
+
+    if fill is not None:
+        arr[...] = fill
+    return arr
+
+
+def _finalize(arr: np.ndarray) -> np.ndarray:
+    """
+    Flush memory-mapped outputs and reopen them read-only
+    """
+    if isinstance(arr, np.memmap):
+        arr.flush()
+        return np.load(arr.filename, mmap_mode='r')
+    return arr
+
+
+def _drift_reader(grid_drift: Union[np.ndarray, Callable], grid: Grid) -> Callable:
+    """
+    Wrap the external drift of the grid into a function, that returns the
+    drift values of the given cells only. Arrays, including memory-mapped
+    arrays, are indexed lazily, i.e. only the requested cells are read.
+    Callables are called with the positions of the cells.
+    """
+    if grid_drift is None:
+        return None
+
+    if callable(grid_drift):
+        def reader(cells, pos):
+            return np.asarray(grid_drift(pos), dtype=float)
+        return reader
+
+    # one or more drift grids of the grid shape
+    if tuple(grid_drift.shape[-grid.ndim:]) != grid.shape:
+        raise ValueError('grid_drift has shape %s, but the grid has shape %s.' % (grid_drift.shape, grid.shape))
+    n_drifts = int(np.prod(grid_drift.shape[:-grid.ndim]))
+    flat = grid_drift.reshape(n_drifts, -1)
+
+    def reader(cells, pos):
+        return np.asarray(flat[:, cells], dtype=float)
+    return reader
+
+
+def _n_workers(n_jobs: int = None) -> int:
+    """
+    Resolve the number of worker processes. Negative numbers follow the
+    joblib convention: -1 uses all CPUs, -2 all but one and so on.
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    return n_jobs
+
+
+# Krige instance of the current worker process. It is set once per worker
+# by the pool initializer, so that only the grid positions travel per block.
+_WORKER_KRIGE = None
+
+
+def _init_worker(krige):
+    global _WORKER_KRIGE
+    _WORKER_KRIGE = krige
+
+
+class _DualKrige:
+    """
+    Estimate-only kriging of a :class:`Krige <gstools.Krige>` instance.
+    The kriging matrix is contracted with the conditions once, so that
+    each target point only needs the product of these dual weights and
+    its right-hand side, instead of the full matrix product.
+
+    The dual weights rely on private members of gstools. If a gstools
+    version lacks one of them, the Krige instance is used as it is.
+    """
+    _MEMBERS = ('_krige_mat', '_krige_cond', '_get_krige_vecs', '_pre_ext_drift', 'pre_pos', 'post_field')
+
+    @classmethod
+    def supports(cls, krige) -> bool:
+        return isinstance(krige, gs.Krige) and all(getattr(krige, m, None) is not None for m in cls._MEMBERS)
+
+    def __init__(self, krige):
+        self.krige = krige
+        self.weights = krige._krige_cond @ krige._krige_mat
+
+    def __call__(self, pos: List[np.ndarray], mesh_type: str = 'unstructured', ext_drift: np.ndarray = None, return_var: bool = False, store: bool = False):
+        krige = self.krige
+        iso_pos, _ = krige.pre_pos(pos, mesh_type)
+        n_points = len(iso_pos[0])
+        k_vec = krige._get_krige_vecs(iso_pos, (0, n_points), krige._pre_ext_drift(n_points, ext_drift))
+        return krige.post_field(self.weights @ k_vec, save=False)
+
+
+def _krige_block(pos: List[np.ndarray], ext_drift: np.ndarray = None, return_var: bool = True):
+    result = _WORKER_KRIGE(pos, mesh_type='unstructured', ext_drift=ext_drift, return_var=return_var, store=False)
+    return result if return_var else (result, None)
+
+
+def _run_blocks(
+    krige,
+    grid: Grid,
+    field_flat: np.ndarray,
+    sigma_flat: np.ndarray,
+    block_size: int,
+    n_jobs: int = None,
+    ext_drift: Callable = None
+):
+    """
+    Krige all blocks of active grid cells into the flat output arrays. If
+    more than one worker is requested, the blocks are distributed to a
+    process pool. If sigma_flat is None, the kriging variance is not
+    calculated. ext_drift is a reader from _drift_reader, which is only
+    called for the current block.
+    """
+    n_points = grid.n_active
+    workers = _n_workers(n_jobs)
+    return_var = sigma_flat is not None
+    if not return_var and _DualKrige.supports(krige):
+        krige = _DualKrige(krige)
+
+    def block_drift(cells, pos):
+        return None if ext_drift is None else ext_drift(cells, pos)
+
+    # serial execution
+    if workers == 1:
+        for block in _iter_blocks(n_points, block_size):
+            cells = grid.cells(block)
+            pos = grid.positions(cells)
+            drift = block_drift(cells, pos)
+            if return_var:
+                field_flat[cells], sigma_flat[cells] = krige(pos, mesh_type='unstructured', ext_drift=drift, store=False)
+            else:
+                field_flat[cells] = krige(pos, mesh_type='unstructured', ext_drift=drift, return_var=False, store=False)
+        return
+
+    # use a few blocks per worker to balance the load
+    block_size = max(min(block_size, int(np.ceil(n_points / (4 * workers)))), 1)
+
+    def collect(done):
+        for future in done:
+            c, (f, s) = pending.pop(future), future.result()
+            field_flat[c] = f
+            if return_var:
+                sigma_flat[c] = s
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(krige, )) as pool:
+        # the positions and drift of a block are only read on submission and
+        # at most two blocks per worker are in flight, to bound the memory
+        pending = dict()
+        for block in _iter_blocks(n_points, block_size):
+            if len(pending) >= 2 * workers:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            cells = grid.cells(block)
+            pos = grid.positions(cells)
+            pending[pool.submit(_krige_block, pos, block_drift(cells, pos), return_var)] = cells
+        collect(wait(pending).done)
+
+
+def _get_krige(variogram: skg.Variogram, **kwargs):
+    """
+    Return the Krige instance for the variogram and kriging arguments.
+    The instance is looked up in the krige_cache by a content hash of the
+    sample, the variogram parameters and the kriging arguments, and only
+    built if it was not cached.
+    """
+    key = content_hash(
+        variogram.coordinates,
+        variogram.values,
+        variogram.describe(),
+        kwargs
+    )
+    krige = krige_cache.get(key)
+
+    if krige is None:
+        krige = variogram.to_gs_krige(**kwargs)
+        krige_cache.put(key, krige)
+
+    return krige
+
 
 def _kriging(
     variogram: skg.Variogram,
     grid_resolution = None,
     return_type = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    grid_drift: Union[np.ndarray, Callable] = None,
+    n_neighbours: int = None,
+    search_radius: float = None,
     plot_kwargs = {},
     **kwargs
 ) -> Union[List[np.ndarray], go.Figure]:
     """
     Actual interface to gstools
     """
-    # get the kriging class
-    krige = variogram.to_gs_krige(**kwargs)
-
+    # return a new kriging class, as the user may change it
     if return_type == 'object':
-        return krige
-
-    # build the grid
-    if isinstance(grid_resolution, int):
-        # get the coordinate ranges
-        lower = np.min(variogram.coordinates, axis=0)
-        upper = np.max(variogram.coordinates, axis=0)
-        dims = [np.linspace(l, u, grid_resolution) for l, u in zip(lower, upper)]
+        return variogram.to_gs_krige(**kwargs)
+
+    # get the kriging class - or the local neighbourhoods
+    if n_neighbours is not None or search_radius is not None:
+        krige = LocalKrige(variogram, n_neighbours=n_neighbours, search_radius=search_radius, **kwargs)
     else:
-        raise AttributeError('Right now, only integer grid_resolutions are supported.')
+        krige = _get_krige(variogram, **kwargs)
+
+    # build the grid - masked cells will be NaN
+    grid = _build_grid(variogram, grid_resolution)
+    fill = None if grid.mask is None else np.nan
+
+    # preallocate the result and krige the grid block by block
+    field = _allocate(grid.shape, output_dir, 'field', fill=fill)
+    field_flat = field.reshape(-1)
+    if return_variance:
+        sigma = _allocate(grid.shape, output_dir, 'sigma', fill=fill)
+        sigma_flat = sigma.reshape(-1)
+    else:
+        sigma = sigma_flat = None
+
+    # external drift kriging needs the drift on the grid
+    if krige.ext_drift_no > 0 and grid_drift is None:
+        raise ValueError('External drift kriging needs the grid_drift to krige a grid.')
+    drift = _drift_reader(grid_drift, grid)
 
-    # call structured
-    field, sigma = krige.structured(dims)
+    block_size = _block_size(krige.krige_size, max_memory, grid.n_active)
+    _run_blocks(krige, grid, field_flat, sigma_flat, block_size, n_jobs=n_jobs, ext_drift=drift)
+    field, sigma = _finalize(field), _finalize(sigma)
 
     if return_type == 'grid':
         return (field, sigma)
@@ -55,12 +322,18 @@ def _kriging(
 
 def ordinary_kriging(
     variogram: skg.Variogram,
-    grid_resolution: int,
+    grid_resolution: Union[int, Grid],
     exact: bool = True,
     cond_err: Union[Literal['nugget'], float, list] = 'nugget',
     pseudo_inv: bool = True,
     pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
     return_type: Literal['object', 'plot', 'grid'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    n_neighbours: int = None,
+    search_radius: float = None,
     **kwargs
 ) -> Union[List[np.ndarray], go.Figure]:
     """
@@ -72,19 +345,21 @@ def ordinary_kriging(
     parameters.
 
     .. note::
-        Right now, there are only very limited possibilities to specify
-        an interpolation grid. Only setting the resolution of the result
-        like: ``50x50`` is possible by passing the integer ``50``.
-        More fine-grained control will be added with a future release.
+        The interpolation grid can be set by its resolution, i.e. a
+        ``50x50`` grid by passing the integer ``50``. For more control,
+        pass a :class:`Grid <hydrobox.geostat.Grid>` with a bounding box,
+        cell sizes and an optional mask. Only the active cells of a
+        masked grid are kriged, all other cells are NaN.
 
     Parameters
     ----------
     variogram : skgstat.Variogram
         Variogram used for kriging
-    grid_resolution : int
+    grid_resolution : int, hydrobox.geostat.Grid
         Resoultion of the interpolation grid. The resolution will be used
         in all input data dimensions, which can lead to non-quadratic
-        grid cells.
+        grid cells. Alternatively, a :class:`Grid <hydrobox.geostat.Grid>`
+        specifying the bounding box, cell size and mask of the grid.
     exact : bool
         If True (default), the input data will be matched exactly.
         Refer to :class:`Ordinary <gstools.krige.Ordinary>` 
@@ -105,11 +380,42 @@ def ordinary_kriging(
         Specify how the result should be retuned. Can be the
         kriging class itself (``'object'``), the interpolated
         grid (``'grid'``) or a plot of the grid (``'plot'``).
+    max_memory : float
+        Memory budget in megabytes. If given, the grid is kriged in
+        blocks that fit into this budget and assembled into
+        preallocated output arrays. This keeps the peak memory flat
+        for high grid resolutions. If None (default), the full grid
+        is kriged at once.
+    n_jobs : int
+        Number of worker processes. If larger than one, the grid is
+        split into blocks, which are kriged in a process pool. The
+        kriging system is sent to each worker only once. ``-1`` uses
+        all available CPUs. Defaults to None (serial).
+    output_dir : str
+        If given, the interpolation grid and the kriging error grid are
+        written block by block into ``field.npy`` and ``sigma.npy`` in
+        this directory. The grids are returned as read-only memory-mapped
+        arrays and never held in memory as a whole.
+    return_variance : bool
+        If False, only the interpolation grid is calculated and the
+        kriging error grid is returned as None. This saves about half
+        of the time and memory. Defaults to True.
+    n_neighbours : int
+        If given, the grid is kriged from local neighbourhoods instead
+        of all observations. Compact tiles of grid cells are kriged from
+        the n_neighbours observations closest to the tile, which are
+        found with a KD-tree. Use this for large samples.
+    search_radius : float
+        Maximum distance of the observations in the local
+        neighbourhoods. If n_neighbours is not set, all observations
+        within the search_radius are used.
 
     Returns
     -------
     results : numpy.ndarray, numpy.ndarray
-        Interpolation grid and kriging error grid
+        Interpolation grid and kriging error grid. Memory-mapped arrays,
+        if an output_dir is given. The error grid is None, if
+        return_variance is False.
     fig : plotly.graph_objects.Figure, matplotlib.Figure
         Figure of the result plot.
 
@@ -127,13 +433,19 @@ def ordinary_kriging(
         variogram=variogram,
         grid_resolution=grid_resolution,
         return_type=return_type,
+        max_memory=max_memory,
+        n_jobs=n_jobs,
+        output_dir=output_dir,
+        return_variance=return_variance,
+        n_neighbours=n_neighbours,
+        search_radius=search_radius,
         plot_kwargs=kwargs,
         **args
     )
 
 def simple_kriging(
     variogram: skg.Variogram,
-    grid_resolution: int,
+    grid_resolution: Union[int, Grid],
     mean: float,
     exact: bool = True,
     cond_err: Union[Literal['nugget'], float, list] = 'nugget',
@@ -141,6 +453,12 @@ def simple_kriging(
     pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
 
     return_type: Literal['object', 'plot', 'grid'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    n_neighbours: int = None,
+    search_radius: float = None,
         **kwargs
 ) -> Union[List[np.ndarray], go.Figure]:
     """
@@ -156,19 +474,21 @@ def simple_kriging(
     available, refer to :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
 
     .. note::
-        Right now, there are only very limited possibilities to specify
-        an interpolation grid. Only setting the resolution of the result
-        like: ``50x50`` is possible by passing the integer ``50``.
-        More fine-grained control will be added with a future release.
+        The interpolation grid can be set by its resolution, i.e. a
+        ``50x50`` grid by passing the integer ``50``. For more control,
+        pass a :class:`Grid <hydrobox.geostat.Grid>` with a bounding box,
+        cell sizes and an optional mask. Only the active cells of a
+        masked grid are kriged, all other cells are NaN.
 
     Parameters
     ----------
     variogram : skgstat.Variogram
         Variogram used for kriging
-    grid_resolution : int
+    grid_resolution : int, hydrobox.geostat.Grid
         Resoultion of the interpolation grid. The resolution will be used
         in all input data dimensions, which can lead to non-quadratic
-        grid cells.
+        grid cells. Alternatively, a :class:`Grid <hydrobox.geostat.Grid>`
+        specifying the bounding box, cell size and mask of the grid.
     mean : float
         The mean value of the field, that has to be known a priori.
         If you pass bs here, you will interpolate bs.
@@ -192,11 +512,42 @@ def simple_kriging(
         Specify how the result should be retuned. Can be the
         kriging class itself (``'object'``), the interpolated
         grid (``'grid'``) or a plot of the grid (``'plot'``).
+    max_memory : float
+        Memory budget in megabytes. If given, the grid is kriged in
+        blocks that fit into this budget and assembled into
+        preallocated output arrays. This keeps the peak memory flat
+        for high grid resolutions. If None (default), the full grid
+        is kriged at once.
+    n_jobs : int
+        Number of worker processes. If larger than one, the grid is
+        split into blocks, which are kriged in a process pool. The
+        kriging system is sent to each worker only once. ``-1`` uses
+        all available CPUs. Defaults to None (serial).
+    output_dir : str
+        If given, the interpolation grid and the kriging error grid are
+        written block by block into ``field.npy`` and ``sigma.npy`` in
+        this directory. The grids are returned as read-only memory-mapped
+        arrays and never held in memory as a whole.
+    return_variance : bool
+        If False, only the interpolation grid is calculated and the
+        kriging error grid is returned as None. This saves about half
+        of the time and memory. Defaults to True.
+    n_neighbours : int
+        If given, the grid is kriged from local neighbourhoods instead
+        of all observations. Compact tiles of grid cells are kriged from
+        the n_neighbours observations closest to the tile, which are
+        found with a KD-tree. Use this for large samples.
+    search_radius : float
+        Maximum distance of the observations in the local
+        neighbourhoods. If n_neighbours is not set, all observations
+        within the search_radius are used.
 
     Returns
     -------
     results : numpy.ndarray, numpy.ndarray
-        Interpolation grid and kriging error grid
+        Interpolation grid and kriging error grid. Memory-mapped arrays,
+        if an output_dir is given. The error grid is None, if
+        return_variance is False.
     fig : plotly.graph_objects.Figure, matplotlib.Figure
         Figure of the result plot.
 
@@ -215,6 +566,12 @@ def simple_kriging(
         variogram=variogram,
         grid_resolution=grid_resolution,
         return_type=return_type,
+        max_memory=max_memory,
+        n_jobs=n_jobs,
+        output_dir=output_dir,
+        return_variance=return_variance,
+        n_neighbours=n_neighbours,
+        search_radius=search_radius,
         plot_kwargs=kwargs,
         **args
     )
@@ -222,7 +579,7 @@ def simple_kriging(
 
 def universal_kriging(
     variogram: skg.Variogram,
-    grid_resolution: int,
+    grid_resolution: Union[int, Grid],
     drift_functions: Literal['linear', 'quadratic'],
     exact: bool = True,
     cond_err: Union[Literal['nugget'], float, list] = 'nugget',
@@ -230,6 +587,12 @@ def universal_kriging(
     pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
 
     return_type: Literal['object', 'plot', 'grid'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    n_neighbours: int = None,
+    search_radius: float = None,
         **kwargs
 ) -> Union[List[np.ndarray], go.Figure]:
     """
@@ -249,19 +612,21 @@ def universal_kriging(
     external drifts.
 
     .. note::
-        Right now, there are only very limited possibilities to specify
-        an interpolation grid. Only setting the resolution of the result
-        like: ``50x50`` is possible by passing the integer ``50``.
-        More fine-grained control will be added with a future release.
+        The interpolation grid can be set by its resolution, i.e. a
+        ``50x50`` grid by passing the integer ``50``. For more control,
+        pass a :class:`Grid <hydrobox.geostat.Grid>` with a bounding box,
+        cell sizes and an optional mask. Only the active cells of a
+        masked grid are kriged, all other cells are NaN.
 
     Parameters
     ----------
     variogram : skgstat.Variogram
         Variogram used for kriging
-    grid_resolution : int
+    grid_resolution : int, hydrobox.geostat.Grid
         Resoultion of the interpolation grid. The resolution will be used
         in all input data dimensions, which can lead to non-quadratic
-        grid cells.
+        grid cells. Alternatively, a :class:`Grid <hydrobox.geostat.Grid>`
+        specifying the bounding box, cell size and mask of the grid.
     drift_functions : str
         The drift function used to perform regression kriging on the
         values of the sample. Can be either ``'linear'`` or ``'quadratic'``.
@@ -287,11 +652,42 @@ def universal_kriging(
         Specify how the result should be retuned. Can be the
         kriging class itself (``'object'``), the interpolated
         grid (``'grid'``) or a plot of the grid (``'plot'``).
+    max_memory : float
+        Memory budget in megabytes. If given, the grid is kriged in
+        blocks that fit into this budget and assembled into
+        preallocated output arrays. This keeps the peak memory flat
+        for high grid resolutions. If None (default), the full grid
+        is kriged at once.
+    n_jobs : int
+        Number of worker processes. If larger than one, the grid is
+        split into blocks, which are kriged in a process pool. The
+        kriging system is sent to each worker only once. ``-1`` uses
+        all available CPUs. Defaults to None (serial).
+    output_dir : str
+        If given, the interpolation grid and the kriging error grid are
+        written block by block into ``field.npy`` and ``sigma.npy`` in
+        this directory. The grids are returned as read-only memory-mapped
+        arrays and never held in memory as a whole.
+    return_variance : bool
+        If False, only the interpolation grid is calculated and the
+        kriging error grid is returned as None. This saves about half
+        of the time and memory. Defaults to True.
+    n_neighbours : int
+        If given, the grid is kriged from local neighbourhoods instead
+        of all observations. Compact tiles of grid cells are kriged from
+        the n_neighbours observations closest to the tile, which are
+        found with a KD-tree. Use this for large samples.
+    search_radius : float
+        Maximum distance of the observations in the local
+        neighbourhoods. If n_neighbours is not set, all observations
+        within the search_radius are used.
 
     Returns
     -------
     results : numpy.ndarray, numpy.ndarray
-        Interpolation grid and kriging error grid
+        Interpolation grid and kriging error grid. Memory-mapped arrays,
+        if an output_dir is given. The error grid is None, if
+        return_variance is False.
     fig : plotly.graph_objects.Figure, matplotlib.Figure
         Figure of the result plot.
 
@@ -310,6 +706,12 @@ def universal_kriging(
         variogram=variogram,
         grid_resolution=grid_resolution,
         return_type=return_type,
+        max_memory=max_memory,
+        n_jobs=n_jobs,
+        output_dir=output_dir,
+        return_variance=return_variance,
+        n_neighbours=n_neighbours,
+        search_radius=search_radius,
         plot_kwargs=kwargs,
         **args
     )
@@ -317,7 +719,7 @@ def universal_kriging(
 
 def ext_drift_kriging(
     variogram: skg.Variogram,
-    grid_resolution: int,
+    grid_resolution: Union[int, Grid],
     ext_drift: np.ndarray,
     exact: bool = True,
     cond_err: Union[Literal['nugget'], float, list] = 'nugget',
@@ -325,6 +727,13 @@ def ext_drift_kriging(
     pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
 
     return_type: Literal['object', 'plot', 'grid'] = 'plot',
+    max_memory: float = None,
+    n_jobs: int = None,
+    output_dir: str = None,
+    return_variance: bool = True,
+    grid_drift: Union[np.ndarray, Callable] = None,
+    n_neighbours: int = None,
+    search_radius: float = None,
         **kwargs
 ) -> Union[List[np.ndarray], go.Figure]:
     """
@@ -344,19 +753,21 @@ def ext_drift_kriging(
     without drift.
 
     .. note::
-        Right now, there are only very limited possibilities to specify
-        an interpolation grid. Only setting the resolution of the result
-        like: ``50x50`` is possible by passing the integer ``50``.
-        More fine-grained control will be added with a future release.
+        The interpolation grid can be set by its resolution, i.e. a
+        ``50x50`` grid by passing the integer ``50``. For more control,
+        pass a :class:`Grid <hydrobox.geostat.Grid>` with a bounding box,
+        cell sizes and an optional mask. Only the active cells of a
+        masked grid are kriged, all other cells are NaN.
 
     Parameters
     ----------
     variogram : skgstat.Variogram
         Variogram used for kriging
-    grid_resolution : int
+    grid_resolution : int, hydrobox.geostat.Grid
         Resoultion of the interpolation grid. The resolution will be used
         in all input data dimensions, which can lead to non-quadratic
-        grid cells.
+        grid cells. Alternatively, a :class:`Grid <hydrobox.geostat.Grid>`
+        specifying the bounding box, cell size and mask of the grid.
     ext_drift : np.ndarray
         External drift values at the observation points
     exact : bool
@@ -379,11 +790,51 @@ def ext_drift_kriging(
         Specify how the result should be retuned. Can be the
         kriging class itself (``'object'``), the interpolated
         grid (``'grid'``) or a plot of the grid (``'plot'``).
+    max_memory : float
+        Memory budget in megabytes. If given, the grid is kriged in
+        blocks that fit into this budget and assembled into
+        preallocated output arrays. This keeps the peak memory flat
+        for high grid resolutions. If None (default), the full grid
+        is kriged at once.
+    n_jobs : int
+        Number of worker processes. If larger than one, the grid is
+        split into blocks, which are kriged in a process pool. The
+        kriging system is sent to each worker only once. ``-1`` uses
+        all available CPUs. Defaults to None (serial).
+    output_dir : str
+        If given, the interpolation grid and the kriging error grid are
+        written block by block into ``field.npy`` and ``sigma.npy`` in
+        this directory. The grids are returned as read-only memory-mapped
+        arrays and never held in memory as a whole.
+    return_variance : bool
+        If False, only the interpolation grid is calculated and the
+        kriging error grid is returned as None. This saves about half
+        of the time and memory. Defaults to True.
+    grid_drift : numpy.ndarray, Callable
+        External drift values on the interpolation grid, i.e. a DEM
+        at the grid resolution. Needed, unless the return_type is
+        ``'object'``. Can be an array of the grid shape, or with a
+        leading axis for multiple drifts. Use a memory-mapped array,
+        like ``np.load(path, mmap_mode='r')``, to read only the part
+        of the drift needed for the current block. Alternatively, a
+        callable, that returns the drift values for a list of
+        coordinate arrays, one per axis, i.e. to read a raster window.
+    n_neighbours : int
+        If given, the grid is kriged from local neighbourhoods instead
+        of all observations. Compact tiles of grid cells are kriged from
+        the n_neighbours observations closest to the tile, which are
+        found with a KD-tree. Use this for large samples.
+    search_radius : float
+        Maximum distance of the observations in the local
+        neighbourhoods. If n_neighbours is not set, all observations
+        within the search_radius are used.
 
     Returns
     -------
     results : numpy.ndarray, numpy.ndarray
-        Interpolation grid and kriging error grid
+        Interpolation grid and kriging error grid. Memory-mapped arrays,
+        if an output_dir is given. The error grid is None, if
+        return_variance is False.
     fig : plotly.graph_objects.Figure, matplotlib.Figure
         Figure of the result plot.
 
@@ -402,6 +853,202 @@ def ext_drift_kriging(
         variogram=variogram,
         grid_resolution=grid_resolution,
         return_type=return_type,
+        max_memory=max_memory,
+        n_jobs=n_jobs,
+        output_dir=output_dir,
+        return_variance=return_variance,
+        grid_drift=grid_drift,
+        n_neighbours=n_neighbours,
+        search_radius=search_radius,
         plot_kwargs=kwargs,
         **args
     )
+
+
+def batch_kriging(
+    variogram: skg.Variogram,
+    values: np.ndarray,
+    grid_resolution: Union[int, Grid],
+    mean: Union[None, float, np.ndarray] = None,
+    exact: bool = True,
+    cond_err: Union[Literal['nugget'], float, list] = 'nugget',
+    pseudo_inv: bool = True,
+    pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
+    max_memory: float = None,
+    output_dir: str = None,
+) -> List[np.ndarray]:
+    """
+    Krige many fields observed at the same locations at once.
+    The :class:`Variogram <skgstat.Variogram>` defines the observation
+    locations and the covariance model, which are shared by all fields.
+    Thus, the kriging system has to be built and inverted only once.
+    The kriging weights of each grid block are then applied to all
+    fields in a single matrix product.
+
+    This is most useful for time series of fields, like daily
+    precipitation from the same stations. If no ``mean`` is given,
+    ordinary kriging is used. Otherwise simple kriging with the given
+    mean of each field.
+
+    .. note::
+        All fields need to be observed at all locations. Missing values
+        change the kriging system and are not supported.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging. The fields have to be observed at
+        the coordinates of the variogram.
+    values : numpy.ndarray
+        Array of shape ``(n_fields, n_locations)``, i.e. time by station.
+    grid_resolution : int, hydrobox.geostat.Grid
+        Resoultion of the interpolation grid. The resolution will be used
+        in all input data dimensions, which can lead to non-quadratic
+        grid cells. Alternatively, a :class:`Grid <hydrobox.geostat.Grid>`
+        specifying the bounding box, cell size and mask of the grid.
+    mean : float, numpy.ndarray
+        If given, simple kriging is used with the known mean. Can be a
+        scalar used for all fields or an array with one mean per field.
+    exact : bool
+        If True (default), the input data will be matched exactly.
+        Refer to :class:`Krige <gstools.krige.Krige>` for more info.
+    cond_err : str, float, list
+        Measurement error, or variogram nugget.
+        Refer to :class:`Krige <gstools.krige.Krige>` for more info.
+    pseudo_inv : bool
+        If True, the Kriging is more robust, but also slower.
+        Refer to :class:`Krige <gstools.krige.Krige>` for more info.
+    pseudo_inv_type : str
+        Type of matrix inversion used if pseudo_inv is True.
+        Refer to :class:`Krige <gstools.krige.Krige>` for more info.
+    max_memory : float
+        Memory budget in megabytes for the kriging weights and the
+        fields of one grid block. If None (default), the full grid
+        is processed at once.
+    output_dir : str
+        If given, the fields and the kriging error grid are written
+        block by block into ``field.npy`` and ``sigma.npy`` in this
+        directory and returned as read-only memory-mapped arrays.
+
+    Returns
+    -------
+    fields : numpy.ndarray
+        Interpolated fields of shape ``(n_fields, *grid_shape)``
+    sigma : numpy.ndarray
+        Kriging error grid. It does not depend on the values and is
+        the same for all fields.
+
+    Raises
+    ------
+    ValueError :
+        if the values do not match the variogram coordinates or
+        contain NaN values.
+
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_fields, n_locations = values.shape
+    if n_locations != len(variogram.coordinates):
+        raise ValueError('values need one column per variogram coordinate, got %d columns for %d coordinates.' % (n_locations, len(variogram.coordinates)))
+    if np.isnan(values).any():
+        raise ValueError('values must not contain NaN values.')
+
+    # build the shared kriging system
+    args = dict(
+        exact=exact,
+        cond_err=cond_err,
+        pseudo_inv=pseudo_inv,
+        pseudo_inv_type=pseudo_inv_type
+    )
+    if mean is not None:
+        args.update(mean=0.0)
+        mean = np.broadcast_to(np.asarray(mean, dtype=float), (n_fields, ))
+    else:
+        mean = np.zeros(n_fields)
+    krige = _get_krige(variogram, **args)
+
+    # the conditions of all fields, padded like the kriging system
+    cond = np.zeros((n_fields, krige.krige_size))
+    cond[:, :n_locations] = values - mean[:, None]
+
+    # build the grid - masked cells will be NaN
+    grid = _build_grid(variogram, grid_resolution)
+    fill = None if grid.mask is None else np.nan
+
+    fields = _allocate((n_fields, ) + grid.shape, output_dir, 'field', fill=fill)
+    sigma = _allocate(grid.shape, output_dir, 'sigma', fill=fill)
+    fields_flat, sigma_flat = fields.reshape(n_fields, -1), sigma.reshape(-1)
+
+    # the block has to hold the weights and all fields
+    block_size = _block_size(krige.krige_size, max_memory, grid.n_active, n_fields=n_fields)
+    for block in _iter_blocks(grid.n_active, block_size):
+        cells = grid.cells(block)
+        pos = grid.positions(cells)
+
+        # RHS of the kriging system and the weights of all block points
+        iso_pos, _ = krige.pre_pos(pos, mesh_type='unstructured')
+        k_vec = krige._get_krige_vecs(iso_pos)
+        weights = krige._krige_mat @ k_vec
+
+        fields_flat[:, cells] = cond @ weights + mean[:, None]
+        sigma_flat[cells] = np.maximum(krige.model.sill - np.einsum('ij,ij->j', k_vec, weights), 0)
+
+    return _finalize(fields), _finalize(sigma)
+
+
+def progressive_kriging(
+    variogram: skg.Variogram,
+    resolutions: List[int] = (25, 100, 400),
+    method: Literal['ordinary', 'simple', 'universal', 'ext_drift'] = 'ordinary',
+    return_type: Literal['plot', 'grid'] = 'plot',
+    **kwargs
+):
+    """
+    Krige a sequence of increasingly fine grids. This is a generator,
+    that yields the result of each resolution as soon as it is available,
+    so that a coarse preview can be shown, while the finer grids are
+    still kriged. The kriging system is built for the first grid and
+    reused from the cache for all others.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    resolutions : list
+        Grid resolutions in the order they are kriged.
+        Defaults to ``(25, 100, 400)``.
+    method : str
+        The kriging function to use. Can be one of ``'ordinary'``
+        (default), ``'simple'``, ``'universal'`` or ``'ext_drift'``.
+    return_type : str
+        Return the interpolated grids (``'grid'``) or a plot of each
+        grid (``'plot'``).
+    kwargs :
+        All other arguments are passed to the kriging function, i.e.
+        :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`.
+
+    Yields
+    ------
+    resolution : int
+        The resolution of the current pass
+    result : tuple, plotly.graph_objects.Figure, matplotlib.Figure
+        Interpolation grid and kriging error grid, or the figure of the
+        current pass.
+
+    Examples
+    --------
+    >>> for resolution, fig in progressive_kriging(vario, (25, 100)):
+    ...     show(fig)
+
+    """
+    methods = dict(
+        ordinary=ordinary_kriging,
+        simple=simple_kriging,
+        universal=universal_kriging,
+        ext_drift=ext_drift_kriging
+    )
+    if method not in methods:
+        raise ValueError("method has to be one of [%s]" % ', '.join(methods))
+    func = methods[method]
+
+    for resolution in resolutions:
+        yield resolution, func(variogram, resolution, return_type=return_type, **kwargs)
@@ -0,0 +1,180 @@
+"""
+Moving-neighbourhood kriging.
+
+Global kriging solves one system of all observations, which is O(n³)
+to set up. The :class:`LocalKrige` class kriges compact tiles of target
+points from their nearest observations only. The neighbours are found
+with a KD-tree and each tile solves a small kriging system.
+"""
+from typing import List, Union
+from collections import OrderedDict
+
+import numpy as np
+import gstools as gs
+import skgstat as skg
+from scipy.spatial import cKDTree
+
+
+class LocalKrige:
+    """
+    Callable, that kriges target points from local neighbourhoods. It
+    mimics the call signature of :class:`Krige <gstools.Krige>`, so that
+    it can be used in place of the global system.
+
+    The target points of a call are grouped into tiles of a regular
+    lattice. All points of a tile are kriged from the same neighbourhood:
+    the ``n_neighbours`` observations closest to the tile center, optionally limited to the
+    ``search_radius``. The tile edge length is half the typical
+    neighbourhood radius, so that the neighbourhood is still centered
+    on each point of the tile.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    n_neighbours : int
+        Number of nearest observations used per tile.
+    search_radius : float
+        Maximum distance of the used observations. If n_neighbours is
+        None, all observations within the radius are used.
+    kwargs :
+        Keyword arguments passed to :class:`Krige <gstools.Krige>`.
+        Per-observation arguments like ``ext_drift`` or a ``cond_err``
+        list are subset to the neighbourhood.
+
+    """
+    def __init__(
+        self,
+        variogram: skg.Variogram,
+        n_neighbours: int = None,
+        search_radius: float = None,
+        **kwargs
+    ):
+        if n_neighbours is None and search_radius is None:
+            raise ValueError('Either n_neighbours or search_radius has to be set.')
+
+        self.model = variogram.to_gstools()
+        self.coordinates = np.asarray(variogram.coordinates, dtype=float)
+        self.values = np.asarray(variogram.values, dtype=float)
+        self.n_neighbours = None if n_neighbours is None else min(int(n_neighbours), len(self.values))
+        self.search_radius = search_radius
+        self.tree = cKDTree(self.coordinates)
+
+        # split the per-observation arguments
+        kwargs['fit_variogram'] = False
+        self.ext_drift = kwargs.pop('ext_drift', None)
+        if self.ext_drift is not None:
+            self.ext_drift = np.atleast_2d(np.asarray(self.ext_drift, dtype=float))
+        cond_err = kwargs.get('cond_err', 'nugget')
+        if not isinstance(cond_err, str) and np.size(cond_err) > 1:
+            self.cond_err = np.asarray(cond_err, dtype=float)
+            kwargs.pop('cond_err')
+        else:
+            self.cond_err = None
+        self.kwargs = kwargs
+
+        self.tile_extent = self._tile_extent()
+        self._systems = OrderedDict()
+
+    def _tile_extent(self) -> float:
+        """
+        Half the median distance of the observations to their furthest
+        neighbour in the neighbourhood.
+        """
+        if self.n_neighbours is None:
+            return self.search_radius / 2
+        k = min(self.n_neighbours + 1, len(self.values))
+        d, _ = self.tree.query(self.coordinates, k=k)
+        radius = np.median(d[:, -1])
+        if self.search_radius is not None:
+            radius = min(radius, self.search_radius)
+        return max(radius / 2, np.finfo(float).eps)
+
+    @property
+    def krige_size(self) -> int:
+        """
+        Size of the local kriging systems, used to estimate block sizes.
+        """
+        if self.n_neighbours is not None:
+            n = self.n_neighbours
+        else:
+            n = max(len(i) for i in self.tree.query_ball_point(self.coordinates[:100], self.search_radius))
+        return n + 1 + self.ext_drift_no
+
+    @property
+    def ext_drift_no(self) -> int:
+        return 0 if self.ext_drift is None else len(self.ext_drift)
+
+    def neighbours(self, center: np.ndarray) -> np.ndarray:
+        """
+        Sorted indices of the observations used for the given center.
+        """
+        if self.n_neighbours is not None:
+            radius = np.inf if self.search_radius is None else self.search_radius
+            d, idx = self.tree.query(center, k=self.n_neighbours, distance_upper_bound=radius)
+            idx = np.atleast_1d(idx)[np.isfinite(np.atleast_1d(d))]
+        else:
+            idx = np.asarray(self.tree.query_ball_point(center, self.search_radius), dtype=int)
+        return np.sort(idx)
+
+    def system(self, idx: np.ndarray) -> gs.Krige:
+        """
+        Kriging system of the given observations. The last systems are
+        kept, as neighbouring tiles often share their neighbourhood.
+        """
+        key = idx.tobytes()
+        if key in self._systems:
+            self._systems.move_to_end(key)
+            return self._systems[key]
+
+        kwargs = dict(self.kwargs)
+        if self.ext_drift is not None:
+            kwargs['ext_drift'] = self.ext_drift[:, idx]
+        if self.cond_err is not None:
+            kwargs['cond_err'] = self.cond_err[idx]
+        krige = gs.Krige(self.model, self.coordinates[idx].T, self.values[idx], **kwargs)
+
+        self._systems[key] = krige
+        if len(self._systems) > 32:
+            self._systems.popitem(last=False)
+        return krige
+
+    def __call__(
+        self,
+        pos: List[np.ndarray],
+        mesh_type: str = 'unstructured',
+        ext_drift: np.ndarray = None,
+        return_var: bool = True,
+        store: bool = False
+    ):
+        if mesh_type != 'unstructured':
+            raise ValueError('LocalKrige only supports unstructured positions.')
+        points = np.column_stack(pos).astype(float)
+        field = np.full(len(points), np.nan)
+        sigma = np.full(len(points), np.nan) if return_var else None
+        if ext_drift is not None:
+            ext_drift = np.atleast_2d(ext_drift)
+
+        # group the points into tiles. The tiles are aligned to a global
+        # lattice, so the result does not depend on the blocks of the call
+        keys = np.floor(points / self.tile_extent).astype(np.int64)
+        tile_keys, tiles = np.unique(keys, axis=0, return_inverse=True)
+        tiles = tiles.ravel()
+        order = np.argsort(tiles, kind='stable')
+        bounds = np.flatnonzero(np.diff(tiles[order])) + 1
+
+        for key, tile in zip(tile_keys, np.split(order, bounds)):
+            idx = self.neighbours((key + 0.5) * self.tile_extent)
+            # tiles without observations stay NaN
+            if len(idx) == 0:
+                continue
+
+            krige = self.system(idx)
+            drift = None if ext_drift is None else ext_drift[:, tile]
+            result = krige(points[tile].T, ext_drift=drift, return_var=return_var, store=False)
+            if return_var:
+                field[tile], sigma[tile] = result
+            else:
+                field[tile] = result
+
+        return (field, sigma) if return_var else field
@@ -0,0 +1,189 @@
+from typing import Union, Literal
+import numpy as np
+import pandas as pd
+import skgstat as skg
+from scipy.spatial.distance import cdist
+
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.kriging import _get_krige, _build_grid, _block_size, _iter_blocks
+
+
+def _reductions(krige, ainv, G, k_eval, iso_eval, iso_stations, iso_cand, diag, max_memory=None):
+    """
+    Mean kriging variance reduction over the evaluation points for each
+    candidate, if it was added to the kriging system given by ainv.
+    The Schur complement of the bordered system gives the reduction in
+    closed form, without inverting a new kriging matrix per candidate.
+    """
+    model = krige.model
+    cf = model.cov_nugget if krige.exact else model.covariance
+    n_cand = iso_cand.shape[1]
+    reduction = np.empty(n_cand)
+
+    bs = _block_size(len(iso_eval[0]), max_memory=max_memory, n_points=n_cand)
+    for block in _iter_blocks(n_cand, bs):
+        cand = iso_cand[:, block]
+
+        # new column of the kriging matrix: observations, unbiasedness, added stations
+        a = np.empty((ainv.shape[0], cand.shape[1]))
+        a[:krige.cond_no] = model.covariance(krige._get_dists(krige._krige_pos, cand))
+        a[krige.cond_no] = 1
+        a[krige.cond_no + 1:] = model.covariance(cdist(iso_stations.T, cand.T))
+
+        # conditional variance of the candidate and residual covariance to the evaluation points
+        s = diag - np.einsum('ij,ij->j', a, ainv @ a)
+        r = G @ a - cf(cdist(iso_eval.T, cand.T))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            red = np.mean(r**2, axis=0) / s
+
+        # candidates on existing stations do not add information
+        reduction[block] = np.where(s > 1e-12 * model.sill, red, 0.)
+
+    return reduction
+
+
+def network_design(
+    variogram: skg.Variogram,
+    candidates: np.ndarray,
+    grid_resolution: Union[int, Grid] = 50,
+    n_stations: int = None,
+    exact: bool = True,
+    cond_err: Union[Literal['nugget'], float, list] = 'nugget',
+    pseudo_inv: bool = True,
+    pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
+    max_memory: float = None
+) -> pd.DataFrame:
+    """
+    Rank candidate locations for new stations by the reduction of the
+    mean ordinary kriging variance over the grid. The inverted kriging
+    system of :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`
+    is updated by rank-one updates, instead of kriging the grid again
+    for each candidate.
+
+    If n_stations is given, the stations are selected greedily: the best
+    candidate is added to the kriging system and the remaining candidates
+    are ranked again, until n_stations are selected.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    candidates : numpy.ndarray
+        Array of shape ``(n_candidates, n_dims)`` of the candidate
+        locations.
+    grid_resolution : int, hydrobox.geostat.Grid
+        Grid of the evaluation points. The mean kriging variance is taken
+        over the active cells of the grid. If an integer is passed, a
+        grid of this resolution spanning the observations is used.
+        Defaults to 50.
+    n_stations : int
+        If None (default), all candidates are ranked by the variance
+        reduction of adding each of them alone. Otherwise, n_stations
+        candidates are selected greedily.
+    exact : bool
+        If True (default), the input data will be matched exactly.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    cond_err : str, float, list
+        Measurement error, or variogram nugget. New stations are assumed
+        to have the mean measurement error.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv : bool
+        If True, the Kriging is more robust, but also slower.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv_type : str
+        Type of matrix inversion used if pseudo_inv is True.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    max_memory : float
+        Maximum memory in MB used to rank a block of candidates.
+        If None (default), all candidates are ranked at once.
+
+    Returns
+    -------
+    ranking : pandas.DataFrame
+        One row per ranked or selected candidate, indexed by the
+        candidate index. The columns are the candidate coordinates,
+        ``'variance_reduction'`` and the ``'mean_variance'`` after
+        adding the candidate. Selected candidates are in order of
+        selection, ranked candidates in order of descending variance
+        reduction.
+
+    """
+    candidates = np.asarray(candidates, dtype=float)
+    if candidates.ndim != 2 or candidates.shape[1] != variogram.dim:
+        raise ValueError('candidates has to be of shape (n_candidates, %d).' % variogram.dim)
+
+    krige = _get_krige(
+        variogram,
+        exact=exact,
+        cond_err=cond_err,
+        pseudo_inv=pseudo_inv,
+        pseudo_inv_type=pseudo_inv_type
+    )
+    model = krige.model
+    cf = model.cov_nugget if krige.exact else model.covariance
+
+    # evaluation points and their RHS of the kriging system
+    grid = _build_grid(variogram, grid_resolution)
+    iso_eval, _ = krige.pre_pos(grid.positions(grid.cells(slice(0, grid.n_active))), mesh_type='unstructured')
+    iso_cand, _ = krige.pre_pos(tuple(candidates.T), mesh_type='unstructured')
+    k_eval = krige._get_krige_vecs(iso_eval)
+
+    # diagonal of the kriging matrix for a new station
+    diag = model.var + float(np.mean(krige.cond_err))
+
+    ainv = krige._krige_mat
+    G = k_eval.T @ ainv
+    mean_variance = np.mean(model.sill - np.einsum('ij,ji->i', G, k_eval))
+    iso_stations = np.empty((iso_eval.shape[0], 0))
+
+    # rank all candidates at once
+    if n_stations is None:
+        reduction = _reductions(krige, ainv, G, k_eval, iso_eval, iso_stations, iso_cand, diag, max_memory)
+        order = np.argsort(-reduction, kind='stable')
+        index = order
+        reduction = reduction[order]
+        variances = mean_variance - reduction
+    else:
+        if n_stations > len(candidates):
+            raise ValueError('Cannot select %d of %d candidates.' % (n_stations, len(candidates)))
+        index, reduction, variances = [], [], []
+        available = np.ones(len(candidates), dtype=bool)
+
+        for _ in range(n_stations):
+            red = _reductions(krige, ainv, G, k_eval, iso_eval, iso_stations, iso_cand, diag, max_memory)
+            red[~available] = -np.inf
+            best = int(np.argmax(red))
+            available[best] = False
+            mean_variance -= red[best]
+            index.append(best)
+            reduction.append(red[best])
+            variances.append(mean_variance)
+
+            # add the station to the inverted kriging matrix by a bordered update
+            cand = iso_cand[:, [best]]
+            a = np.concatenate([
+                model.covariance(krige._get_dists(krige._krige_pos, cand))[:, 0],
+                [1.],
+                model.covariance(cdist(iso_stations.T, cand.T))[:, 0]
+            ])
+            u = ainv @ a
+            s = diag - a @ u
+            ainv = np.block([
+                [ainv + np.outer(u, u) / s, -u[:, None] / s],
+                [-u[None, :] / s, np.array([[1. / s]])]
+            ])
+            iso_stations = np.concatenate([iso_stations, cand], axis=1)
+            k_eval = np.concatenate([k_eval, cf(cdist(cand.T, iso_eval.T))], axis=0)
+            G = k_eval.T @ ainv
+
+        index = np.array(index)
+
+    df = pd.DataFrame(candidates[index], index=index, columns=['x', 'y', 'z'][:variogram.dim] if variogram.dim <= 3 else None)
+    df['variance_reduction'] = reduction
+    df['mean_variance'] = variances
+    return df
@@ -0,0 +1,227 @@
+"""
+Pair sampling for variograms of large samples.
+
+The experimental variogram of n observations uses all n(n-1)/2 point
+pairs. The :class:`PairSampledMetricSpace` estimates it from a bounded
+random subset of the pairs instead. The subset is stratified by the
+lag classes, so that the short lags, which hold only a small share of
+all pairs, are still represented.
+"""
+from typing import Union
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree, ConvexHull, QhullError
+from scipy.spatial.distance import pdist
+from skgstat import MetricSpace
+
+
+class PairSampledMetricSpace(MetricSpace):
+    """
+    :class:`MetricSpace <skgstat.MetricSpace>` of a random, lag-stratified
+    subset of the point pairs. It can be passed as coordinates to
+    :class:`Variogram <skgstat.Variogram>`. The distances are a sparse
+    matrix, that only holds the sampled pairs.
+
+    The candidate pairs are drawn uniformly from all pairs and from the
+    nearest neighbours of random points. They are split into n_lags equal
+    distance classes up to max_dist and each class gets an equal share of
+    n_pairs. Classes with fewer candidates pass their share on to the
+    other classes. The memory is bounded by a small multiple of n_pairs.
+
+    Note that the stratification changes the number of pairs per lag
+    class. The semi-variances are estimated without bias, but the
+    bin counts no longer reflect the full sample.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        Coordinate array of shape ``(n_points, n_dims)``
+    dist_metric : str
+        Only ``'euclidean'`` is supported.
+    max_dist : float
+        Maximum distance of the sampled pairs. If None, the diagonal of
+        the bounding box of coords is used.
+    n_pairs : int
+        Number of sampled pairs. Defaults to 100000.
+    n_lags : int
+        Number of distance classes used to stratify the pairs.
+    seed : int
+        Seed of the sampling.
+
+    """
+    # candidate pairs drawn per sampled pair
+    oversample = 4
+
+    # nearest neighbours per point used as short-lag candidates
+    n_neighbours = 16
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        dist_metric: str = 'euclidean',
+        max_dist: float = None,
+        n_pairs: int = 100000,
+        n_lags: int = 10,
+        seed: int = None
+    ):
+        if dist_metric != 'euclidean':
+            raise ValueError('Pair sampling only supports the euclidean distance.')
+        super(PairSampledMetricSpace, self).__init__(np.asarray(coords, dtype=float), dist_metric, max_dist)
+        self.n_pairs = int(n_pairs)
+        self.n_lags = int(n_lags)
+        self.seed = seed
+
+    def _candidates(self, rng: np.random.Generator):
+        """
+        Return the unique candidate pairs (i < j) as two index arrays
+        """
+        n = len(self.coords)
+        n_cand = self.oversample * self.n_pairs
+
+        # all pairs for small samples
+        if n * (n - 1) // 2 <= n_cand:
+            return np.triu_indices(n, k=1)
+
+        # uniform pairs for the long lags
+        i = rng.integers(n, size=n_cand)
+        j = rng.integers(n, size=n_cand)
+
+        # nearest neighbours of random points for the short lags. Thinning
+        # the points by 4 doubles the neighbour distance in 2D, thus the
+        # neighbours of each thinned level cover the next longer lags.
+        k = min(self.n_neighbours, n - 1)
+        levels = max(int(np.log(n / (k + 1)) / np.log(4)) + 1, 1)
+        for level in range(levels):
+            sub = rng.choice(n, size=max(n // 4**level, k + 1), replace=False)
+            pts = rng.choice(len(sub), size=min(len(sub), max(n_cand // (levels * k), 1)), replace=False)
+            _, nn = cKDTree(self.coords[sub]).query(self.coords[sub[pts]], k=k + 1)
+            i = np.concatenate((i, np.repeat(sub[pts], k)))
+            j = np.concatenate((j, sub[nn[:, 1:]].reshape(-1)))
+
+        # unique pairs without self-pairs
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        code = np.unique(lo[lo != hi].astype(np.int64) * n + hi[lo != hi])
+        return code // n, code % n
+
+    @staticmethod
+    def _quota(counts: np.ndarray, n_pairs: int) -> np.ndarray:
+        """
+        Share n_pairs equally among the classes. Classes with less pairs
+        than their share keep all pairs and pass the rest on.
+        """
+        if counts.sum() <= n_pairs:
+            return counts
+
+        # find the largest equal share t with sum(min(counts, t)) <= n_pairs
+        c = np.sort(counts)
+        cum = np.concatenate(([0], np.cumsum(c)))
+        for k in range(len(c)):
+            t = (n_pairs - cum[k]) // (len(c) - k)
+            if t <= c[k]:
+                break
+        quota = np.minimum(counts, t)
+
+        # hand out the remainder to the classes with pairs left
+        rest = n_pairs - quota.sum()
+        quota[np.flatnonzero(counts > quota)[:rest]] += 1
+        return quota
+
+    @property
+    def dists(self):
+        """
+        Symmetric sparse distance matrix of the sampled pairs
+        """
+        if self._dists is None:
+            rng = np.random.default_rng(self.seed)
+            i, j = self._candidates(rng)
+            d = np.linalg.norm(self.coords[i] - self.coords[j], axis=1)
+
+            # the sparse matrix can't hold zero distances
+            upper = self.max_dist
+            if upper is None:
+                upper = np.linalg.norm(self.coords.max(axis=0) - self.coords.min(axis=0))
+            keep = (d > 0) & (d <= upper)
+            i, j, d = i[keep], j[keep], d[keep]
+
+            # stratify by the lag classes
+            cls = np.minimum((d / upper * self.n_lags).astype(int), self.n_lags - 1)
+            quota = self._quota(np.bincount(cls, minlength=self.n_lags), self.n_pairs)
+
+            # take a random subset of each class
+            order = rng.permutation(len(d))
+            order = order[np.argsort(cls[order], kind='stable')]
+            starts = np.concatenate(([0], np.cumsum(np.bincount(cls, minlength=self.n_lags))[:-1]))
+            rank = np.arange(len(order)) - starts[cls[order]]
+            take = order[rank < quota[cls[order]]]
+            i, j, d = i[take], j[take], d[take]
+
+            n = len(self.coords)
+            self._dists = sparse.coo_matrix(
+                (np.concatenate((d, d)), (np.concatenate((i, j)), np.concatenate((j, i)))),
+                shape=(n, n)
+            ).tocsr()
+
+        return self._dists
+
+
+def _max_distance(coordinates: np.ndarray) -> float:
+    """
+    Largest distance of any point pair. Only the vertices of the convex
+    hull are compared, thus the full distance matrix is not needed.
+    """
+    if coordinates.shape[1] > 1:
+        try:
+            coordinates = coordinates[ConvexHull(coordinates).vertices]
+        except QhullError:
+            # collinear points have no hull
+            pass
+
+    # the bounding box diagonal is exact on a line and an upper bound otherwise
+    if len(coordinates) > 5000:
+        return float(np.linalg.norm(coordinates.max(axis=0) - coordinates.min(axis=0)))
+    return float(pdist(coordinates).max())
+
+
+def _sparse_metric_space(
+    coordinates: np.ndarray,
+    dist_func: str = 'euclidean',
+    maxlag: Union[None, str, float] = None,
+    n_lags: int = 10,
+    n_pairs: int = None,
+    seed: int = None
+):
+    """
+    Build the MetricSpace of sparse distances within maxlag. If n_pairs
+    is given, the pairs are sampled. Returns the MetricSpace and the
+    absolute maxlag.
+    """
+    if dist_func != 'euclidean':
+        raise ValueError('Sparse distances are only supported for the euclidean distance.')
+
+    # skgstat handles 1D coordinates like points on a line
+    coordinates = np.asarray(coordinates, dtype=float)
+    if coordinates.ndim < 2:
+        coordinates = np.column_stack((coordinates, np.zeros(len(coordinates))))
+
+    # the sparse distances need an absolute maxlag
+    if isinstance(maxlag, str):
+        raise ValueError("maxlag='%s' needs all distances. Use an absolute or relative maxlag." % maxlag)
+    elif maxlag is not None and maxlag < 1:
+        maxlag = maxlag * _max_distance(coordinates)
+
+    if n_pairs is not None:
+        metric_space = PairSampledMetricSpace(
+            coordinates,
+            dist_func,
+            max_dist=maxlag,
+            n_pairs=n_pairs,
+            n_lags=n_lags or 10,
+            seed=seed
+        )
+    else:
+        if maxlag is None:
+            raise ValueError("distance_backend='kdtree' needs a maxlag.")
+        metric_space = MetricSpace(coordinates, dist_func, max_dist=maxlag)
+
+    return metric_space, maxlag
@@ -0,0 +1,323 @@
+from typing import List, Union, Literal
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import skgstat as skg
+import gstools as gs
+import plotly.graph_objects as go
+
+from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.kriging import _build_grid, _block_size, _allocate, _finalize, _n_workers
+
+
+# The quantiles are estimated from a histogram of each cell. The bins span
+# this many kriging standard deviations around the kriging estimate.
+_Z_RANGE = 5.
+
+
+class _Moments:
+    """
+    Running mean, variance and histogram of the simulated cells. Partial
+    moments of several workers are merged with the update of Chan et al.,
+    so that no realization has to be kept in memory.
+    """
+    def __init__(self, n_cells: int, n_bins: int = None):
+        self.n = 0
+        self.mean = np.zeros(n_cells)
+        self.m2 = np.zeros(n_cells)
+        self.hist = None if n_bins is None else np.zeros((n_cells, n_bins), dtype=np.uint32)
+
+    def update(self, field: np.ndarray, center: np.ndarray, std: np.ndarray):
+        # Welford's update for a single realization
+        self.n += 1
+        delta = field - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (field - self.mean)
+
+        if self.hist is not None:
+            # bin the realization standardized by the kriging estimate
+            n_bins = self.hist.shape[1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where(std > 0, (field - center) / std, 0.)
+            bins = np.clip(((z + _Z_RANGE) * n_bins / (2 * _Z_RANGE)).astype(int), 0, n_bins - 1)
+            self.hist[np.arange(len(bins)), bins] += 1
+
+    def merge(self, other: '_Moments'):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta**2 * self.n * other.n / n
+        self.n = n
+
+        if self.hist is not None:
+            self.hist += other.hist
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / max(self.n - 1, 1)
+
+    def quantiles(self, q: List[float], center: np.ndarray, std: np.ndarray) -> np.ndarray:
+        """
+        Interpolate the quantiles q linearly from the cumulative histogram
+        """
+        n_cells, n_bins = self.hist.shape
+        width = 2 * _Z_RANGE / n_bins
+        cdf = np.cumsum(self.hist, axis=1) / self.n
+        rows = np.arange(n_cells)
+
+        result = np.empty((len(q), n_cells))
+        for i, p in enumerate(q):
+            b = np.minimum(np.argmax(cdf >= p - 1e-12, axis=1), n_bins - 1)
+            lower = np.where(b > 0, cdf[rows, np.maximum(b - 1, 0)], 0.)
+            count = self.hist[rows, b] / self.n
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frac = np.where(count > 0, (p - lower) / count, 0.5)
+            z = -_Z_RANGE + width * (b + np.clip(frac, 0, 1))
+            result[i] = center + z * std
+        return result
+
+
+# conditioned random field, the standardization and the moments of the
+# current worker. The moments are accumulated over all realizations of
+# the worker and only sent back once.
+_WORKER_STATE = None
+
+
+def _init_worker(srf, pos, center, std, chunk_size, n_bins=None):
+    global _WORKER_STATE
+    _WORKER_STATE = (srf, pos, center, std, chunk_size, _Moments(len(center), n_bins))
+
+
+def _realization(seed: int) -> np.ndarray:
+    srf, pos, _, _, chunk_size, _ = _WORKER_STATE
+    # the kriging of the conditioned field is stored and reused for all seeds
+    return srf(
+        pos,
+        seed=seed,
+        mesh_type='unstructured',
+        store=[False, False, True],
+        krige_store=[False, True],
+        chunk_size=chunk_size
+    )
+
+
+def _simulate(seeds: List[int]) -> _Moments:
+    """
+    Add the realizations of the given seeds to the moments of the worker
+    """
+    _, _, center, std, _, moments = _WORKER_STATE
+    for seed in seeds:
+        moments.update(_realization(seed), center, std)
+    return moments
+
+
+def _simulate_fields(seeds: List[int]) -> List[np.ndarray]:
+    """
+    Realizations of the given seeds
+    """
+    return [_realization(seed) for seed in seeds]
+
+
+def simulate(
+    variogram: skg.Variogram,
+    grid_resolution: Union[int, Grid],
+    n_realizations: int = 100,
+    quantiles: List[float] = None,
+    seed: int = None,
+    n_jobs: int = None,
+    return_ensemble: bool = False,
+    output_dir: str = None,
+    max_memory: float = None,
+    n_bins: int = 50,
+    return_type: Literal['describe', 'grid', 'plot'] = 'describe',
+    exact: bool = True,
+    cond_err: Union[Literal['nugget'], float, list] = 'nugget',
+    pseudo_inv: bool = True,
+    pseudo_inv_type: Literal['pinv', 'pinv2', 'pinvh'] = 'pinv',
+    **kwargs
+) -> Union[dict, List[np.ndarray], go.Figure]:
+    """
+    Conditional Gaussian simulation of an ensemble of fields. The fields
+    are simulated by :class:`CondSRF <gstools.CondSRF>`, conditioned by
+    the kriging of the variogram. The ensemble mean, variance and
+    quantiles are accumulated per realization, thus the ensemble does
+    not need to fit into memory.
+
+    Each realization has its own seed, spawned from seed by
+    :class:`numpy.random.SeedSequence`. The ensemble is therefore
+    reproducible and does not depend on n_jobs.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram used for kriging
+    grid_resolution : int, hydrobox.geostat.Grid
+        Grid of the simulation. If an integer is passed, a grid of this
+        resolution spanning the observations is used.
+    n_realizations : int
+        Number of simulated fields. Defaults to 100.
+    quantiles : list
+        Quantiles of the ensemble to estimate, i.e. ``[0.05, 0.95]``.
+        The quantiles are interpolated from a histogram of each cell,
+        with n_bins bins around the kriging estimate.
+    seed : int
+        Seed of the ensemble. If None (default), the ensemble is
+        not reproducible.
+    n_jobs : int
+        Number of worker processes simulating the realizations.
+        If None (default), the ensemble is simulated in this process.
+        Negative numbers follow the joblib convention, i.e.
+        ``-1`` uses all CPUs.
+    return_ensemble : bool
+        If True, all realizations are returned as well. Defaults to False.
+    output_dir : str
+        If given, all result grids, including the ensemble, are written
+        to ``.npy`` files in this directory and returned as read-only
+        memory maps.
+    max_memory : float
+        Maximum memory in MB used by the kriging of the conditioned
+        field. If None (default), all cells are kriged at once.
+    n_bins : int
+        Number of histogram bins per cell used to estimate the quantiles.
+        The histogram needs ``4 * n_bins`` bytes per cell and worker.
+        Defaults to 50.
+    return_type : str
+        ``'describe'`` (default) returns a dict of all results,
+        ``'grid'`` the ensemble mean and variance and ``'plot'``
+        a plot of the ensemble mean and variance.
+    exact : bool
+        If True (default), the input data will be matched exactly.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    cond_err : str, float, list
+        Measurement error, or variogram nugget.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv : bool
+        If True, the Kriging is more robust, but also slower.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    pseudo_inv_type : str
+        Type of matrix inversion used if pseudo_inv is True.
+        Refer to :class:`Ordinary <gstools.krige.Ordinary>`
+        for more info.
+    kwargs :
+        Arguments passed to the plotting function.
+
+    Returns
+    -------
+    description : dict
+        If return_type is ``'describe'``. The keys ``'mean'`` and
+        ``'variance'`` hold the ensemble mean and variance grids,
+        ``'quantiles'`` an array of shape ``(n_quantiles, *grid.shape)``
+        if quantiles were requested and ``'ensemble'`` an array of shape
+        ``(n_realizations, *grid.shape)`` if return_ensemble is True.
+    grids : tuple
+        If return_type is ``'grid'``. Ensemble mean and variance grid.
+    fig : plotly.graph_objects.Figure, matplotlib.Figure
+        If return_type is ``'plot'``. Figure of the ensemble mean and
+        variance.
+
+    """
+    if return_type not in ('describe', 'grid', 'plot'):
+        raise ValueError("return_type '%s' not supported." % return_type)
+
+    # a new Krige instance, as the conditioned field stores its kriging
+    krige = variogram.to_gs_krige(
+        exact=exact,
+        cond_err=cond_err,
+        pseudo_inv=pseudo_inv,
+        pseudo_inv_type=pseudo_inv_type
+    )
+    srf = gs.CondSRF(krige)
+
+    grid = _build_grid(variogram, grid_resolution)
+    fill = None if grid.mask is None else np.nan
+    cells = grid.cells(slice(0, grid.n_active))
+    pos = grid.positions(cells)
+    chunk_size = _block_size(krige.krige_size, max_memory, grid.n_active)
+
+    # the kriging estimate standardizes the histogram of each cell
+    n_bins = n_bins if quantiles else None
+    center = std = np.zeros(grid.n_active)
+    if n_bins is not None:
+        center, variance = krige(pos, mesh_type='unstructured', chunk_size=chunk_size, store=False)
+        std = np.sqrt(variance)
+
+    # one independent seed per realization
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(n_realizations)]
+
+    if return_ensemble:
+        ensemble = _allocate((n_realizations, ) + grid.shape, output_dir, 'ensemble', fill=fill)
+        ensemble_flat = ensemble.reshape(n_realizations, -1)
+
+    workers = _n_workers(n_jobs)
+    initargs = (srf, pos, center, std, chunk_size, n_bins)
+    if workers == 1:
+        _init_worker(*initargs)
+        if not return_ensemble:
+            moments = _simulate(seeds)
+        else:
+            moments = _Moments(grid.n_active, n_bins)
+            for i, seed in enumerate(seeds):
+                field = _realization(seed)
+                ensemble_flat[i, cells] = field
+                moments.update(field, center, std)
+    elif not return_ensemble:
+        # each worker accumulates its share of the realizations and
+        # sends its moments back once
+        moments = _Moments(grid.n_active, n_bins)
+        shares = [s for s in np.array_split(seeds, workers) if len(s) > 0]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            for part in pool.map(_simulate, [list(s) for s in shares]):
+                moments.merge(part)
+    else:
+        # the realizations travel back anyway, thus they are accumulated
+        # here. Use a few chunks of realizations per worker to balance
+        # the load and keep at most two chunks per worker in flight.
+        size = max(int(np.ceil(n_realizations / (4 * workers))), 1)
+        moments = _Moments(grid.n_active, n_bins)
+
+        def collect(done):
+            for future in done:
+                start = pending.pop(future)
+                for i, field in enumerate(future.result()):
+                    ensemble_flat[start + i, cells] = field
+                    moments.update(field, center, std)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            pending = dict()
+            for start in range(0, n_realizations, size):
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[pool.submit(_simulate_fields, seeds[start:start + size])] = start
+            collect(wait(pending).done)
+
+    # write the statistics to the grid
+    def to_grid(values, name, shape=grid.shape):
+        arr = _allocate(shape, output_dir, name, fill=fill)
+        arr.reshape(-1, grid.size)[:, cells] = values
+        return _finalize(arr)
+
+    mean = to_grid(moments.mean, 'mean')
+    variance = to_grid(moments.variance, 'variance')
+
+    if return_type == 'grid':
+        return (mean, variance)
+    elif return_type == 'plot':
+        if mean.ndim > 2:
+            raise ValueError('Plotting not supported for dim > 2.')
+        pfunc = plot_function_loader('kriging')
+        return pfunc(
+            func_args=dict(variogram=variogram, field=mean, sigma=variance),
+            plot_args=kwargs
+        )
+
+    result = dict(mean=mean, variance=variance)
+    if quantiles:
+        q = moments.quantiles(quantiles, center, std)
+        result['quantiles'] = to_grid(q, 'quantiles', (len(quantiles), ) + grid.shape)
+    if return_ensemble:
+        result['ensemble'] = _finalize(ensemble)
+
+    return result
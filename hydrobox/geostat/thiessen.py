@@ -0,0 +1,163 @@
+"""
+Thiessen polygon weights.
+
+The Thiessen (Voronoi) weight of a station for a catchment is the share
+of the catchment area, that is closer to this station than to any other.
+The areas are approximated by discretizing the catchments into points.
+"""
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.block import _block_points
+from hydrobox.geostat.cache import LRUCache
+
+
+class Thiessen:
+    """
+    Station to catchment weights of Thiessen polygons. The weight matrix
+    is built once per pattern of available stations and cached. If
+    stations drop out, the catchment area is re-assigned to the
+    remaining stations.
+
+    Parameters
+    ----------
+    stations : numpy.ndarray
+        Array of shape ``(n_stations, 2)`` of the station locations.
+    blocks : list, numpy.ndarray
+        Either a list of 2D catchment polygons, each of shape
+        ``(n_vertices, 2)``, or an integer label array of the shape of
+        grid. Each label ``>= 0`` is a catchment, negative labels belong
+        to no catchment.
+    grid : hydrobox.geostat.Grid
+        Grid of the label array. Needed, if blocks is a label array.
+    discretization : int
+        Polygons are discretized by ``discretization`` cells along
+        their longer side. Catchments of a label array use at most
+        ``discretization**2`` evenly spaced cells. Defaults to 50.
+    cache_size : int
+        Number of cached weight matrices, one per pattern of available
+        stations. Defaults to 32.
+
+    Examples
+    --------
+    >>> thiessen = Thiessen(stations, catchments)
+    >>> means = thiessen.apply(precipitation)
+
+    """
+    def __init__(
+        self,
+        stations: np.ndarray,
+        blocks: Union[List[np.ndarray], np.ndarray],
+        grid: Grid = None,
+        discretization: int = 50,
+        cache_size: int = 32
+    ):
+        if not isinstance(blocks, (list, tuple)) and grid is None:
+            raise AttributeError('A grid is needed for a label array of blocks.')
+
+        self.stations = np.asarray(stations, dtype=float)
+        self.names, points = _block_points(blocks, grid=grid, discretization=discretization)
+
+        # all discretization points and the catchment they belong to
+        self.points = np.concatenate(points)
+        self.block_index = np.repeat(np.arange(len(points)), [len(p) for p in points])
+        self.block_size = np.array([len(p) for p in points], dtype=float)
+
+        self.cache = LRUCache(maxsize=cache_size)
+
+    @property
+    def n_stations(self) -> int:
+        return len(self.stations)
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.names)
+
+    def weights(self, available: np.ndarray = None) -> sparse.csr_matrix:
+        """
+        Thiessen weights of the available stations.
+
+        Parameters
+        ----------
+        available : numpy.ndarray
+            Boolean array of shape ``(n_stations, )``. If None (default),
+            all stations are available.
+
+        Returns
+        -------
+        weights : scipy.sparse.csr_matrix
+            Weight matrix of shape ``(n_stations, n_blocks)``. The weights
+            of each catchment sum up to one, unavailable stations have no
+            weight. If no station is available, all weights are zero.
+        """
+        if available is None:
+            available = np.ones(self.n_stations, dtype=bool)
+        available = np.asarray(available, dtype=bool)
+        if available.shape != (self.n_stations, ):
+            raise ValueError('available has to be of shape (%d, ).' % self.n_stations)
+
+        key = np.packbits(available).tobytes()
+        W = self.cache.get(key)
+        if W is not None:
+            return W
+
+        idx = np.flatnonzero(available)
+        if len(idx) == 0:
+            W = sparse.csr_matrix((self.n_stations, self.n_blocks))
+        else:
+            # assign each point to its nearest available station
+            _, nearest = cKDTree(self.stations[idx]).query(self.points)
+            W = sparse.coo_matrix(
+                (1. / self.block_size[self.block_index], (idx[nearest], self.block_index)),
+                shape=(self.n_stations, self.n_blocks)
+            ).tocsr()
+
+        self.cache.put(key, W)
+        return W
+
+    def apply(self, values: Union[np.ndarray, pd.DataFrame]) -> Union[np.ndarray, pd.DataFrame]:
+        """
+        Catchment means of a ``(time, station)`` matrix. Missing values
+        (NaN) are treated as unavailable stations. All timesteps with the
+        same pattern of available stations are averaged by one sparse
+        product.
+
+        Parameters
+        ----------
+        values : numpy.ndarray, pandas.DataFrame
+            Array of shape ``(n_timesteps, n_stations)``.
+
+        Returns
+        -------
+        means : numpy.ndarray, pandas.DataFrame
+            Catchment means of shape ``(n_timesteps, n_blocks)``. A
+            DataFrame is returned with the index of values and one
+            column per catchment. Timesteps without any available
+            station are NaN.
+        """
+        index = values.index if isinstance(values, pd.DataFrame) else None
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        if values.shape[1] != self.n_stations:
+            raise ValueError('values has to be of shape (n_timesteps, %d).' % self.n_stations)
+
+        available = ~np.isnan(values)
+        filled = np.where(available, values, 0.)
+        means = np.full((len(values), self.n_blocks), np.nan)
+
+        # one sparse product per availability pattern
+        patterns, inverse = np.unique(available, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for i, pattern in enumerate(patterns):
+            if not pattern.any():
+                continue
+            rows = inverse == i
+            means[rows] = (self.weights(pattern).T @ filled[rows].T).T
+
+        if index is not None:
+            return pd.DataFrame(means, index=index, columns=self.names)
+        return means
@@ -1,14 +1,67 @@
+import copy
+import warnings
+
 import numpy as np
+import pandas as pd
 import skgstat as skg
+from scipy import sparse, special
+from scipy.optimize import curve_fit
 import gstools as gs
 
 from hydrobox.geostat import typing
 from hydrobox.plotting import plot_function_loader
+from hydrobox.geostat.sampling import _sparse_metric_space
+from hydrobox.geostat.cache import variogram_cache, content_hash, cacheable
+from hydrobox.geostat.context import PairContext
+
+
+def _estimate_variogram(
+    coordinates, values, estimator, model, dist_func, bin_func, fit_method, fit_sigma,
+    use_nugget, maxlag, n_lags, n_pairs, seed, distance_backend, **kwargs
+) -> skg.Variogram:
+    """
+    Build the Variogram instance
+    """
+    # sparse distances within maxlag
+    if n_pairs is not None or distance_backend == 'kdtree':
+        coordinates, maxlag = _sparse_metric_space(
+            coordinates,
+            dist_func=dist_func,
+            maxlag=maxlag,
+            n_lags=n_lags,
+            n_pairs=n_pairs,
+            seed=seed
+        )
+
+    return skg.Variogram(
+        coordinates=coordinates,
+        values=values,
+        estimator=estimator,
+        model=model,
+        dist_func=dist_func,
+        bin_func=bin_func,
+        fit_method=fit_method,
+        fit_sigma=fit_sigma,
+        use_nugget=use_nugget,
+        maxlag=maxlag,
+        n_lags=n_lags,
+        **kwargs
+    )
+
+
+def _copy_variogram(v: skg.Variogram) -> skg.Variogram:
+    """
+    Copy of the variogram, that shares the metric space and the value
+    differences with v. Both are replaced, not changed in place, by
+    the Variogram setters.
+    """
+    memo = {id(getattr(v, name)): getattr(v, name) for name in ('_X', '_diff') if getattr(v, name, None) is not None}
+    return copy.deepcopy(v, memo)
 
 
 def variogram(
-    coordinates: np.ndarray,
-    values: np.ndarray,
+    coordinates: np.ndarray = None,
+    values: np.ndarray = None,
     estimator: typing.Estimator = 'matheron',
     model: typing.Model = 'spherical',
     dist_func: typing.DistFunc = 'euclidean',
@@ -18,6 +71,11 @@ def variogram(
     use_nugget: bool = False,
     maxlag: typing.Maxlag = None,
     n_lags: typing.Union[int, None] = 10,
+    n_pairs: int = None,
+    seed: int = None,
+    distance_backend: typing.Literal['dense', 'kdtree'] = 'dense',
+    cache: bool = False,
+    context: PairContext = None,
     return_type: typing.Literal['object', 'describe', 'plot', 'distance_difference', 'location_trend', 'scattergram'] = 'object',
     **kwargs
 ) -> skg.Variogram:
@@ -28,6 +86,36 @@ def variogram(
 
     Parameters
     ----------
+    n_pairs : int
+        If given, the experimental variogram is estimated from a random
+        subset of n_pairs point pairs, stratified by the lag classes.
+        The full distance matrix is never calculated, which bounds the
+        memory for large samples. Only the euclidean distance is supported.
+        Refer to :class:`PairSampledMetricSpace <hydrobox.geostat.sampling.PairSampledMetricSpace>`.
+    seed : int
+        Seed of the pair sampling. Only used if n_pairs is given.
+    distance_backend : str
+        ``'dense'`` (default) calculates the distances of all point pairs.
+        ``'kdtree'`` finds only the pairs within maxlag by a KD-tree and
+        keeps their distances in a sparse matrix, which saves time and
+        memory in proportion to the pairs beyond maxlag. Needs an absolute
+        or relative maxlag and the euclidean distance.
+    cache : bool
+        If True, the Variogram is looked up in the ``variogram_cache`` by
+        a hash of the coordinates, values, all parameters and the
+        scikit-gstat version, and only estimated on a miss. Thus, changing
+        the return_type does not estimate the variogram again. The cache
+        keeps the distances and differences of each variogram alive,
+        thus it is off by default. The returned copies share these
+        arrays with the cached variogram. Randomly
+        sampled pairs without a seed and variograms of lambdas or
+        locally defined functions, i.e. a custom bin_func, are not cached.
+    context : hydrobox.geostat.PairContext
+        If given, the variogram uses the distances and value differences
+        of the context, instead of the coordinates and values. Only the
+        binning and fitting is done. Variograms of a context are not
+        cached and the pair arguments, like n_pairs, are taken from the
+        context.
     return_type : str
         Specify how the Variogram instance should be returned. Object will
         return the actual instance. 'describe' is the dictionary output
@@ -44,24 +132,37 @@ def variogram(
         If the return type is `'describe'`
 
     """
-    # create the variogram
-    v = skg.Variogram(
-        coordinates=coordinates,
-        values=values,
-        estimator=estimator,
-        model=model,
-        dist_func=dist_func,
-        bin_func=bin_func,
-        fit_method=fit_method,
-        fit_sigma=fit_sigma,
-        use_nugget=use_nugget,
-        maxlag=maxlag,
-        n_lags=n_lags,
-        **kwargs
+    if context is None and (coordinates is None or values is None):
+        raise AttributeError('Either a PairContext or the coordinates and values are needed.')
+
+    # look up the variogram by the content of all arguments
+    key = None
+    params = dict(
+        estimator=estimator, model=model, dist_func=dist_func, bin_func=bin_func,
+        fit_method=fit_method, fit_sigma=fit_sigma, use_nugget=use_nugget, maxlag=maxlag,
+        n_lags=n_lags, n_pairs=n_pairs, seed=seed, distance_backend=distance_backend
     )
+    if cache and context is None and not isinstance(coordinates, skg.MetricSpace) and not (n_pairs is not None and seed is None) and cacheable(params, kwargs):
+        key = content_hash(skg.__version__, np.asarray(coordinates), np.asarray(values), params, kwargs)
+    v = None if key is None else variogram_cache.get(key)
+
+    if context is not None:
+        v = context.variogram(
+            estimator=estimator, model=model, dist_func=dist_func, bin_func=bin_func,
+            fit_method=fit_method, fit_sigma=fit_sigma, use_nugget=use_nugget, maxlag=maxlag,
+            n_lags=n_lags, **kwargs
+        )
+    elif v is None:
+        v = _estimate_variogram(
+            coordinates, values, estimator, model, dist_func, bin_func, fit_method, fit_sigma,
+            use_nugget, maxlag, n_lags, n_pairs, seed, distance_backend, **kwargs
+        )
+        if key is not None:
+            variogram_cache.put(key, v)
 
     if return_type == 'object':
-        return v
+        # the caller may change the variogram, thus never return the cached instance
+        return _copy_variogram(v) if key is not None else v
     elif return_type == 'describe':
         return v.describe(short=False, flat=False)
     
@@ -77,3 +178,371 @@ def variogram(
     return fig
 
 
+def _spherical(h, r, c0, b=0.):
+    return b + c0 * np.where(h <= r, 1.5 * (h / r) - 0.5 * (h / r)**3, 1.)
+
+
+def _exponential(h, r, c0, b=0.):
+    return b + c0 * (1. - np.exp(-h / (r / 3.)))
+
+
+def _gaussian(h, r, c0, b=0.):
+    return b + c0 * (1. - np.exp(-h**2 / (r / 2.)**2))
+
+
+def _cubic(h, r, c0, b=0.):
+    x = h / r
+    return b + c0 * np.where(h < r, 7 * x**2 - 35 / 4 * x**3 + 7 / 2 * x**5 - 3 / 4 * x**7, 1.)
+
+
+def _stable(h, r, c0, s, b=0.):
+    a = r / np.power(3, 1 / s)
+    return np.where(h == 0, b, b + c0 * (1. - np.exp(-np.power(h / a, s))))
+
+
+def _matern(h, r, c0, s, b=0.):
+    x = h * np.sqrt(s) / (r / 2.)
+    return np.where(h == 0, b, b + c0 * (1. - 2 / special.gamma(s) * np.power(x, s) * special.kv(s, 2 * x)))
+
+
+# vectorized versions of the skgstat.models, which map over the lags
+BATCH_MODELS = dict(
+    spherical=_spherical,
+    exponential=_exponential,
+    gaussian=_gaussian,
+    cubic=_cubic,
+    stable=_stable,
+    matern=_matern
+)
+
+# name and upper bound of the third model parameter
+SHAPE_PARAMS = {'stable': ('shape', 2.), 'matern': ('smoothness', 20.)}
+
+
+def _fit_bounds(model: str, x: np.ndarray, y: np.ndarray, use_nugget: bool) -> np.ndarray:
+    """
+    Upper bounds of the model parameters, like the Variogram sets them
+    """
+    shape = SHAPE_PARAMS.get(model)
+    upper = [np.max(x), np.max(y)] + ([shape[1]] if shape else []) + ([0.99 * np.max(y)] if use_nugget else [])
+    return np.asarray(upper)
+
+
+def _fit_model(
+    model: str,
+    x: np.ndarray,
+    y: np.ndarray,
+    use_nugget: bool = False,
+    fit_method: str = 'trf',
+    sigma: np.ndarray = None,
+    p0: np.ndarray = None
+):
+    """
+    Fit one of the BATCH_MODELS to the experimental variogram y at the
+    lags x. Without p0, the fit starts at the upper bounds, like the
+    Variogram. Returns the parameters and the RMSE, or None and inf if
+    the fit fails.
+    """
+    func = BATCH_MODELS[model]
+    if use_nugget:
+        wrapped = func
+    else:
+        def wrapped(*args):
+            return func(*args, 0)
+
+    upper = _fit_bounds(model, x, y, use_nugget)
+    try:
+        with warnings.catch_warnings(), np.errstate(all='ignore'):
+            warnings.simplefilter('ignore')
+            if fit_method == 'trf':
+                cof, _ = curve_fit(wrapped, x, y, p0=upper if p0 is None else p0, bounds=(0, upper), sigma=sigma, method='trf')
+            elif fit_method == 'lm':
+                cof, _ = curve_fit(wrapped, x, y, p0=upper if p0 is None else p0, sigma=sigma, method='lm')
+            else:
+                raise AttributeError("fit_method '%s' not supported." % fit_method)
+    except (RuntimeError, ValueError):
+        return None, np.inf
+    return cof, np.sqrt(np.mean((wrapped(x, *cof) - y)**2))
+
+
+def _batch_experimental(
+    diffs: np.ndarray,
+    groups: np.ndarray,
+    n_lags: int,
+    estimator: str
+) -> np.ndarray:
+    """
+    Experimental variograms of all rows of the absolute pair differences
+    diffs ``(n_fields, n_pairs)``. NaN differences are ignored, thus each
+    row uses only the pairs observed in that row.
+    """
+    valid = ~np.isnan(diffs)
+    inside = groups >= 0
+
+    # one sparse product sums the pairs of each lag class for all rows
+    classes = sparse.csr_matrix(
+        (np.ones(inside.sum()), (np.flatnonzero(inside), groups[inside])),
+        shape=(len(groups), n_lags)
+    )
+    count = valid @ classes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if estimator == 'matheron':
+            return (np.where(valid, diffs**2, 0.) @ classes) / (2 * count)
+        elif estimator == 'cressie':
+            nominator = ((np.where(valid, np.sqrt(diffs), 0.) @ classes) / count)**4
+            return nominator / (2 * (0.457 + 0.494 / count + 0.045 / count**2))
+
+    # the median needs the differences of each lag class
+    gamma = np.full((len(diffs), n_lags), np.nan)
+    for k in range(n_lags):
+        lag = diffs[:, groups == k]
+        if lag.shape[1] > 0:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                gamma[:, k] = 2.198 * np.nanmedian(lag, axis=1)**2 / 2
+    return gamma
+
+
+def batch_variogram(
+    coordinates: np.ndarray,
+    values: typing.Union[np.ndarray, pd.DataFrame],
+    estimator: typing.Literal['matheron', 'cressie', 'dowd'] = 'matheron',
+    model: typing.Literal['spherical', 'exponential', 'gaussian', 'matern', 'cubic', 'stable'] = 'spherical',
+    dist_func: typing.DistFunc = 'euclidean',
+    bin_func: typing.BinFunc = 'even',
+    fit_method: typing.Literal['trf', 'lm'] = 'trf',
+    use_nugget: bool = False,
+    maxlag: typing.Maxlag = None,
+    n_lags: int = 10,
+    warm_start: bool = True,
+    max_memory: float = 256,
+    return_type: typing.Literal['describe', 'experimental'] = 'describe'
+) -> pd.DataFrame:
+    """
+    Estimate one variogram per field of many fields observed at the same
+    locations, i.e. one variogram per day of a station time series.
+    The distances and lag classes depend only on the coordinates, thus
+    they are calculated once. The pairwise differences of all fields are
+    then binned in one vectorized step and the model is fitted to each
+    field, starting from the parameters of the previous field.
+
+    Missing observations are allowed. Each field uses the pairs of its
+    observed locations, while the lag classes are shared by all fields.
+
+    Parameters
+    ----------
+    coordinates : numpy.ndarray
+        Array of coordinates of the locations
+    values : numpy.ndarray, pandas.DataFrame
+        Array of shape ``(n_fields, n_locations)``, i.e. time by station.
+        The index of a DataFrame is used as index of the result.
+    estimator : str
+        Semi-variance estimator. One of ``'matheron'`` (default),
+        ``'cressie'`` or ``'dowd'``.
+    model : str
+        Theoretical variogram model fitted to each field.
+    dist_func : str
+        Distance function of the coordinates.
+    bin_func : str
+        Binning function of the lag classes.
+        Refer to :class:`Variogram <skgstat.Variogram>`.
+    fit_method : str
+        ``'trf'`` (default) or ``'lm'``.
+        Refer to :class:`Variogram <skgstat.Variogram>`.
+    use_nugget : bool
+        If True, a nugget is fitted.
+    maxlag : float, str
+        Maximum lag. Refer to :class:`Variogram <skgstat.Variogram>`.
+    n_lags : int
+        Number of lag classes.
+    warm_start : bool
+        If True (default), the fit of each field starts from the
+        parameters of the previous field, which is faster for slowly
+        varying fields. Otherwise, each fit starts like
+        :class:`Variogram <skgstat.Variogram>`.
+    max_memory : float
+        Memory budget in megabytes for the pairwise differences of one
+        block of fields. Defaults to 256. If None, all fields are binned
+        at once, which needs ``16 * n_fields * n_pairs`` bytes.
+    return_type : str
+        ``'describe'`` (default) returns the fitted parameters and the
+        RMSE of each field. ``'experimental'`` returns the experimental
+        variograms, with the lag classes as columns.
+
+    Returns
+    -------
+    parameters : pandas.DataFrame
+        If the return type is ``'describe'``. The columns are
+        effective_range, sill, nugget, the shape or smoothness of the
+        stable and matern model, and rmse. Fields that can not be fitted
+        have NaN parameters.
+    experimental : pandas.DataFrame
+        If the return type is ``'experimental'``
+
+    Raises
+    ------
+    ValueError :
+        if the values do not match the coordinates
+
+    """
+    index = values.index if isinstance(values, pd.DataFrame) else None
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    if values.shape[1] != len(coordinates):
+        raise ValueError('values need one column per coordinate, got %d columns for %d coordinates.' % (values.shape[1], len(coordinates)))
+    if estimator not in ('matheron', 'cressie', 'dowd'):
+        raise ValueError("estimator '%s' not supported." % estimator)
+    if index is None:
+        index = pd.RangeIndex(len(values))
+
+    # the lag classes only depend on the coordinates, thus the constant
+    # placeholder values are fine
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='All input values are the same')
+        ref = skg.Variogram(
+            coordinates,
+            np.zeros(values.shape[1]),
+            dist_func=dist_func,
+            bin_func=bin_func,
+            maxlag=maxlag,
+            n_lags=n_lags,
+            fit_method=None
+        )
+    bins = np.asarray(ref.bins)
+    groups = ref.lag_groups()
+    i, j = np.triu_indices(values.shape[1], k=1)
+
+    # bin the differences of all fields, in blocks of max_memory
+    block = len(values) if max_memory is None else max(int(max_memory * 1024**2 // (16 * len(i))), 1)
+    gamma = np.concatenate([
+        _batch_experimental(np.abs(values[s:s + block, i] - values[s:s + block, j]), groups, len(bins), estimator)
+        for s in range(0, len(values), block)
+    ])
+
+    if return_type == 'experimental':
+        return pd.DataFrame(gamma, index=index, columns=bins)
+    elif return_type != 'describe':
+        raise ValueError("return_type '%s' not supported." % return_type)
+
+    # fit the model to each field
+    if model not in BATCH_MODELS:
+        raise ValueError("model '%s' not supported." % model)
+    shape = SHAPE_PARAMS.get(model)
+    n_params = 2 + (shape is not None) + use_nugget
+
+    columns = ['effective_range', 'sill', 'nugget'] + ([shape[0]] if shape else []) + ['rmse']
+    result = np.full((len(gamma), len(columns)), np.nan)
+    p0 = None
+    for t, y in enumerate(gamma):
+        observed = ~np.isnan(y)
+        if observed.sum() < n_params or np.nanmax(y) <= 0:
+            continue
+        x, y = bins[observed], y[observed]
+        upper = _fit_bounds(model, x, y, use_nugget)
+
+        cof, rmse = None, np.inf
+        if warm_start and p0 is not None:
+            cof, rmse = _fit_model(model, x, y, use_nugget, fit_method, p0=np.clip(p0, 1e-3 * upper, upper))
+
+        # a range outside of the lags is not identified by the bins, the
+        # warm start is then likely stuck and the field is fitted again
+        if cof is None or not x.min() < cof[0] < x.max():
+            cold, cold_rmse = _fit_model(model, x, y, use_nugget, fit_method)
+            if cold_rmse < rmse:
+                cof, rmse = cold, cold_rmse
+        if cof is None:
+            continue
+        p0 = cof
+
+        nugget = cof[-1] if use_nugget else 0.
+        result[t] = [cof[0], cof[1], nugget] + ([cof[2]] if shape else []) + [rmse]
+
+    return pd.DataFrame(result, index=index, columns=columns)
+
+
+def fit_models(
+    variogram: skg.Variogram,
+    models: list = None,
+    score: typing.Literal['rmse', 'mse', 'mae'] = 'rmse',
+    use_nugget: bool = None,
+    return_type: typing.Literal['describe', 'best_param'] = 'describe'
+) -> pd.DataFrame:
+    """
+    Fit several theoretical models to the experimental variogram of a
+    :class:`Variogram <skgstat.Variogram>` and rank them by their score.
+    The experimental variogram does not depend on the model, thus it is
+    taken from the variogram once and only the models are fitted. This is
+    much faster than a :func:`gridsearch <hydrobox.geostat.gridsearch>`
+    over the models, which estimates the variogram again for each model.
+    The variogram itself is not changed.
+
+    Parameters
+    ----------
+    variogram : skgstat.Variogram
+        Variogram, i.e. estimated by :func:`variogram <hydrobox.geostat.variogram>`.
+        Its fit_method and fit_sigma are used for all models.
+    models : list
+        Names of the models to fit. Defaults to all supported models:
+        spherical, exponential, gaussian, matern, cubic and stable.
+    score : str
+        Score used to rank the models. One of ``'rmse'`` (default),
+        ``'mse'`` or ``'mae'`` of the fitted model at the lags.
+    use_nugget : bool
+        If True, a nugget is fitted. Defaults to the use_nugget of the
+        variogram.
+    return_type : str
+        ``'describe'`` (default) returns the ranked table. ``'best_param'``
+        returns the name of the best model.
+
+    Returns
+    -------
+    ranking : pandas.DataFrame
+        If the return type is ``'describe'``. The models are ordered from
+        the best to the worst score and have the columns effective_range,
+        sill, nugget, shape, smoothness, rmse, mse and mae. Models that
+        can not be fitted are ranked last with NaN parameters.
+    model : str
+        If the return type is ``'best_param'``
+
+    """
+    if models is None:
+        models = list(BATCH_MODELS.keys())
+    for model in models:
+        if model not in BATCH_MODELS:
+            raise ValueError("model '%s' not supported." % model)
+    if score not in ('rmse', 'mse', 'mae'):
+        raise ValueError("score '%s' not supported." % score)
+    if use_nugget is None:
+        use_nugget = variogram.use_nugget
+
+    # the shared experimental variogram
+    x = np.asarray(variogram.bins, dtype=float)
+    y = np.asarray(variogram.experimental, dtype=float)
+    sigma = variogram.fit_sigma
+    observed = ~np.isnan(y)
+    x, y = x[observed], y[observed]
+    if sigma is not None:
+        sigma = np.asarray(sigma)[observed]
+
+    columns = ['effective_range', 'sill', 'nugget', 'shape', 'smoothness', 'rmse', 'mse', 'mae']
+    result = pd.DataFrame(np.nan, index=pd.Index(models, name='model'), columns=columns)
+    for model in models:
+        cof, _ = _fit_model(model, x, y, use_nugget, variogram.fit_method, sigma=sigma)
+        if cof is None:
+            continue
+
+        residuals = BATCH_MODELS[model](x, *cof if use_nugget else (*cof, 0.)) - y
+        result.loc[model, ['effective_range', 'sill']] = cof[:2]
+        result.loc[model, 'nugget'] = cof[-1] if use_nugget else 0.
+        if model in SHAPE_PARAMS:
+            result.loc[model, SHAPE_PARAMS[model][0]] = cof[2]
+        result.loc[model, ['rmse', 'mse', 'mae']] = [
+            np.sqrt(np.mean(residuals**2)),
+            np.mean(residuals**2),
+            np.mean(np.abs(residuals))
+        ]
+
+    result = result.sort_values(score, kind='stable', na_position='last')
+
+    if return_type == 'best_param':
+        return result.index[0]
+    return result
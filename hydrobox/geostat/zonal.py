@@ -0,0 +1,154 @@
+"""
+Zonal statistics of interpolated grids.
+
+A sparse operator maps the grid cells to the zones, i.e. sub-catchments.
+It is built once per grid and zones and cached, so that the fields of
+many timesteps are aggregated without rasterizing the zones again.
+"""
+from typing import List, Union, Literal
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from hydrobox.geostat.grid import Grid
+from hydrobox.geostat.cache import LRUCache, content_hash
+
+
+# cache of the cell to zone operators
+zone_cache = LRUCache(maxsize=16)
+
+
+def _zone_operator(
+    zones: Union[List[np.ndarray], np.ndarray],
+    shape: tuple,
+    grid: Grid = None,
+    weights: np.ndarray = None
+):
+    """
+    Return the zone names and the sparse ``(n_zones, n_cells)`` operator
+    of the cell weights of each zone. The operator is cached by the
+    content of the zones, the grid and the weights.
+    """
+    polygons = isinstance(zones, (list, tuple))
+    if polygons and grid is None:
+        raise AttributeError('A grid is needed to rasterize polygon zones.')
+    grid_spec = None if grid is None else (grid.axes, grid.mask)
+
+    key = content_hash(zones, shape, grid_spec, weights)
+    cached = zone_cache.get(key)
+    if cached is not None:
+        return cached
+
+    n_cells = int(np.prod(shape))
+    if polygons:
+        # zones may overlap, every polygon is rasterized on its own
+        names = list(range(len(zones)))
+        rows, cells = [], []
+        for i, polygon in enumerate(zones):
+            c = np.flatnonzero(grid.polygon_mask(polygon))
+            rows.append(np.full(len(c), i))
+            cells.append(c)
+        rows, cells = np.concatenate(rows), np.concatenate(cells)
+    else:
+        labels = np.asarray(zones)
+        if labels.shape != tuple(shape):
+            raise ValueError('zones has shape %s, but the field has shape %s.' % (labels.shape, shape))
+        flat = labels.reshape(-1)
+        cells = np.flatnonzero(flat >= 0)
+        names, rows = np.unique(flat[cells], return_inverse=True)
+        names = list(names)
+
+    # masked grid cells do not belong to any zone
+    if grid is not None and grid.mask is not None:
+        active = grid.mask.reshape(-1)[cells]
+        rows, cells = rows[active], cells[active]
+
+    w = np.ones(len(cells)) if weights is None else np.asarray(weights, dtype=float).reshape(-1)[cells]
+    operator = sparse.csr_matrix((w, (rows, cells)), shape=(len(names), n_cells))
+    operator.sort_indices()
+
+    zone_cache.put(key, (names, operator))
+    return names, operator
+
+
+def zonal_statistics(
+    field: np.ndarray,
+    zones: Union[List[np.ndarray], np.ndarray],
+    grid: Grid = None,
+    statistic: Literal['mean', 'min', 'max', 'sum'] = 'mean',
+    weights: np.ndarray = None
+) -> Union[pd.Series, pd.DataFrame]:
+    """
+    Aggregate a field, or a stack of fields, to zones. The cell to zone
+    operator is built once for the grid and zones and then cached, thus
+    the fields of all timesteps can be aggregated by one sparse product.
+    NaN cells, i.e. masked grid cells, are ignored.
+
+    Parameters
+    ----------
+    field : numpy.ndarray
+        Field of the grid shape, as returned by
+        :func:`ordinary_kriging <hydrobox.geostat.ordinary_kriging>`,
+        or a stack of fields of shape ``(n_fields, *grid.shape)``.
+    zones : list, numpy.ndarray
+        Either an integer label array of the grid shape, or a list of
+        2D polygons, each of shape ``(n_vertices, 2)``. Each label
+        ``>= 0`` is a zone, negative labels belong to no zone. Polygons
+        may overlap and need the grid.
+    grid : hydrobox.geostat.Grid
+        Grid of the field. Needed for polygon zones. Masked cells of the
+        grid do not belong to any zone.
+    statistic : str
+        Aggregation of the cells of each zone. One of ``'mean'``
+        (default), ``'min'``, ``'max'`` or ``'sum'``.
+    weights : numpy.ndarray
+        Optional cell weights of the grid shape, i.e. the fraction of
+        each cell inside the catchment. ``'mean'`` is then the weighted
+        mean and ``'sum'`` the weighted sum.
+
+    Returns
+    -------
+    statistics : pandas.Series, pandas.DataFrame
+        Series indexed by zone for a single field, or a DataFrame of
+        shape ``(n_fields, n_zones)`` for a stack of fields.
+
+    """
+    field = np.asarray(field, dtype=float)
+    if grid is not None:
+        shape = grid.shape
+    elif isinstance(zones, (list, tuple)):
+        raise AttributeError('A grid is needed to rasterize polygon zones.')
+    else:
+        shape = np.shape(zones)
+    single = field.shape == tuple(shape)
+    stack = field.reshape(1 if single else len(field), -1)
+    if stack.shape[1] != int(np.prod(shape)):
+        raise ValueError('field has shape %s, but the grid has shape %s.' % (field.shape, tuple(shape)))
+
+    names, operator = _zone_operator(zones, shape, grid=grid, weights=weights)
+
+    valid = ~np.isnan(stack)
+    if statistic in ('mean', 'sum'):
+        # one sparse product for all fields
+        total = (operator @ np.where(valid, stack, 0.).T).T
+        if statistic == 'mean':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                total = total / (operator @ valid.T.astype(float)).T
+        result = total
+    elif statistic in ('min', 'max'):
+        # reduce the cells of each zone in the order of the operator
+        ufunc = np.fmin if statistic == 'min' else np.fmax
+        starts = operator.indptr[:-1]
+        empty = np.diff(operator.indptr) == 0
+        result = np.full((len(stack), len(names)), np.nan)
+        if len(operator.indices) > 0:
+            values = stack[:, operator.indices]
+            reduced = ufunc.reduceat(values, np.minimum(starts, len(operator.indices) - 1), axis=1)
+            result[:, ~empty] = reduced[:, ~empty]
+    else:
+        raise ValueError("statistic '%s' not supported." % statistic)
+
+    if single:
+        return pd.Series(result[0], index=names)
+    return pd.DataFrame(result, columns=names)
@@ -11,29 +11,36 @@ except ModuleNotFoundError:
 
 
 def _plot_matplotlib(func_args, plot_args):
-    # build the figure
-    fig, axes = plt.subplots(1, 2, figsize=plot_args.get('figsize', (12, 6)))
-
     # data can be one or two dimensional
     field = func_args['field']
     sigma = func_args['sigma']
     variogram = func_args['variogram']
 
+    # build the figure - sigma is None, if the variance was not calculated
+    if sigma is None:
+        fig, ax = plt.subplots(1, 1, figsize=plot_args.get('figsize', (6, 6)))
+        axes = [ax]
+    else:
+        fig, axes = plt.subplots(1, 2, figsize=plot_args.get('figsize', (12, 6)))
+
     if field.ndim == 1:
         # plot the lines
         axes[0].plot(field)
-        axes[1].plot(sigma)
+        if sigma is not None:
+            axes[1].plot(sigma)
         
     else:
         # plot the im
         m1 = axes[0].imshow(field, origin='lower', cmap=plot_args.get('cmap', 'terrain'))
-        m2 = axes[1].imshow(sigma, origin='lower', cmap=plot_args.get('sigma_cmap', 'hot'))
         plt.colorbar(m1, ax=axes[0])
-        plt.colorbar(m2, ax=axes[1])
+        if sigma is not None:
+            m2 = axes[1].imshow(sigma, origin='lower', cmap=plot_args.get('sigma_cmap', 'hot'))
+            plt.colorbar(m2, ax=axes[1])
 
     # label
     axes[0].set_title('Kriging Grid')
-    axes[1].set_title('Kriging Error')
+    if sigma is not None:
+        axes[1].set_title('Kriging Error')
     plt.tight_layout()
 
     return fig
@@ -62,18 +69,19 @@ def _plot_plotly(func_args, plot_args):
                     type='data',
                     array=sigma.flatten(),
                     visible=True
-                )
+                ) if sigma is not None else None
             )
         )
         # return the figure
         return fig
 
     # if this point is reached, it's a 2D field
+    cols = 1 if sigma is None else 2
     if plot_args.get('surface', False):
-        fig = make_subplots(1, 2, specs=[[{'type': 'surface'}, {'type': 'surface'}]])
+        fig = make_subplots(1, cols, specs=[[{'type': 'surface'}] * cols])
         Trace = go.Surface
     else:
-        fig = make_subplots(1, 2)    
+        fig = make_subplots(1, cols)    
         Trace = go.Heatmap
 
     # add the field
@@ -83,6 +91,8 @@ def _plot_plotly(func_args, plot_args):
     )
 
     # add sigma
+    if sigma is None:
+        return fig
     fig.add_trace(
         Trace(z=sigma, colorscale=plot_args.get('sigma_colorscale', 'thermal')),
         1, 2
@@ -1,6 +1,11 @@
 from skgstat.plotting import backend
 from skgstat import Variogram
 
+try:
+    import plotly.graph_objects as go
+except ModuleNotFoundError:
+    pass
+
 def __plot(variogram: Variogram, plot_type: str, **kwargs): 
     # always suppress sho
     kwargs['show'] = False
@@ -28,7 +33,25 @@ def _plot_matplotlib(func_args, plot_args):
     variogram = func_args['variogram']
     plot_type = func_args.get('plot_type', 'plot')
 
-    return __plot(variogram, plot_type, **plot_args)
+    if plot_type != 'envelope':
+        return __plot(variogram, plot_type, **plot_args)
+
+    # the envelope spans the lowest and highest percentile
+    envelope = func_args['envelope']
+    plot_args = dict(plot_args)
+    color = plot_args.pop('envelope_color', 'grey')
+    fig = __plot(variogram, 'plot', **plot_args)
+    fig.axes[0].fill_between(
+        envelope.columns,
+        envelope.iloc[0],
+        envelope.iloc[-1],
+        color=color,
+        alpha=0.3,
+        label='%s - %s percentile' % (envelope.index[0], envelope.index[-1])
+    )
+    fig.axes[0].legend(loc='upper left')
+
+    return fig
 
 
 def _plot_plotly(func_args, plot_args):
@@ -39,4 +62,25 @@ def _plot_plotly(func_args, plot_args):
     variogram = func_args['variogram']
     plot_type = func_args.get('plot_type', 'plot')
 
-    return __plot(variogram, plot_type, **plot_args)
+    if plot_type != 'envelope':
+        return __plot(variogram, plot_type, **plot_args)
+
+    # the envelope spans the lowest and highest percentile
+    envelope = func_args['envelope']
+    plot_args = dict(plot_args)
+    color = plot_args.pop('envelope_color', 'rgba(128, 128, 128, 0.3)')
+    fig = __plot(variogram, 'plot', **plot_args)
+
+    # draw on the axes of the experimental variogram
+    axes = dict(xaxis=fig.data[0].xaxis, yaxis=fig.data[0].yaxis)
+    fig.add_trace(go.Scatter(
+        x=envelope.columns, y=envelope.iloc[-1], mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip', **axes
+    ))
+    fig.add_trace(go.Scatter(
+        x=envelope.columns, y=envelope.iloc[0], mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor=color,
+        name='%s - %s percentile' % (envelope.index[0], envelope.index[-1]), **axes
+    ))
+
+    return fig
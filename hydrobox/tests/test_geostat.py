@@ -1,3 +1,7 @@
+import warnings
+import pytest
+import numpy as np
+import pandas as pd
 from hydrobox import data
 import hydrobox
 import plotly.graph_objects as go
@@ -56,4 +60,263 @@ def test_gridsearch_variogram():
         return_type='best_param'
     )
 
-    assert isinstance(gs, dict)
\ No newline at end of file
+    assert isinstance(gs, dict)
+
+def test_gridsearch_fast_cv():
+    """Test Gridsearch with the fast cross-validation"""
+    df = data.pancake()
+    param_grid = {'model': ('spherical', 'exponential')}
+
+    best = hydrobox.geostat.gridsearch(
+        param_grid=param_grid,
+        coordinates=df[['x', 'y']].values,
+        values=df.z.values,
+        n_lags=15,
+        cv_method='fast',
+        return_type='best_param'
+    )
+
+    assert best['model'] in param_grid['model']
+
+    # the candidates do not touch the kriging cache
+    cache = hydrobox.geostat.krige_cache
+    cache.clear()
+    hydrobox.geostat.gridsearch(
+        param_grid=param_grid,
+        coordinates=df[['x', 'y']].values,
+        values=df.z.values,
+        n_lags=15,
+        cv_method='fast',
+        return_type='best_param'
+    )
+    assert len(cache) == 0
+    assert cache.info()['misses'] == 0
+
+
+def test_variogram_pair_sampling():
+    """Sampled pairs have to fill all lag classes evenly"""
+    df = data.pancake()
+    vario = hydrobox.geostat.variogram(
+        df[['x', 'y']].values,
+        df.z.values,
+        maxlag=300,
+        n_lags=10,
+        n_pairs=3000,
+        seed=42
+    )
+    full = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag=300, n_lags=10)
+
+    assert vario.distance.size == 3000
+    assert vario.bin_count.min() >= 290
+    assert abs(vario.parameters[0] - full.parameters[0]) / full.parameters[0] < 0.2
+
+    # the sampled variogram can be kriged
+    field, _ = hydrobox.geostat.ordinary_kriging(vario, 10, return_type='grid')
+    assert field.shape == (10, 10)
+
+
+def test_variogram_kdtree_backend():
+    """The KD-tree backend has to match the dense distances within maxlag"""
+    df = data.pancake()
+    dense = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag=0.4, n_lags=12)
+    tree = hydrobox.geostat.variogram(
+        df[['x', 'y']].values, df.z.values, maxlag=0.4, n_lags=12, distance_backend='kdtree'
+    )
+
+    assert tree.maxlag == pytest.approx(dense.maxlag)
+    assert tree.distance.size < 0.6 * dense.distance.size
+    np.testing.assert_allclose(tree.experimental, dense.experimental, rtol=1e-3)
+
+    with pytest.raises(ValueError):
+        hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag='median', distance_backend='kdtree')
+
+
+def test_variogram_cache():
+    """Changing the return_type must not estimate the variogram again"""
+    df = data.pancake()
+    cache = hydrobox.geostat.variogram_cache
+    cache.clear()
+
+    # the cache is opt-in
+    hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, n_lags=12)
+    assert len(cache) == 0 and cache.info()['misses'] == 0
+
+    vario = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, n_lags=12, cache=True)
+    desc = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, n_lags=12, cache=True, return_type='describe')
+    assert cache.info()['misses'] == 1
+    assert cache.info()['hits'] == 1
+    assert desc['params']['n_lags'] == 12
+
+    # the returned object is a copy of the cached one, sharing the distances
+    vario.model = 'gaussian'
+    again = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, n_lags=12, cache=True)
+    assert again.describe()['model'] == 'spherical'
+    assert cache.info()['hits'] == 2
+    assert again._X is vario._X
+    assert again.pairwise_diffs is vario.pairwise_diffs
+
+
+def test_variogram_cache_lambda():
+    """Lambdas share their name and must not be served from the cache"""
+    df = data.pancake()
+    cache = hydrobox.geostat.variogram_cache
+    cache.clear()
+
+    coords, values = df[['x', 'y']].values, df.z.values
+    first = hydrobox.geostat.variogram(coords, values, cache=True, bin_func=lambda d, n, m: (np.linspace(0, d.max(), n + 1)[1:], None))
+    second = hydrobox.geostat.variogram(coords, values, cache=True, bin_func=lambda d, n, m: (np.geomspace(1, d.max(), n), None))
+
+    assert not np.allclose(first.bins, second.bins)
+    assert cache.info()['hits'] == 0
+
+
+def test_variogram_context():
+    """Variograms of a PairContext equal the plain variograms"""
+    df = data.pancake()
+    ctx = hydrobox.geostat.PairContext(df[['x', 'y']].values, df.z.values)
+
+    for estimator, bin_func in (('matheron', 'even'), ('cressie', 'kmeans')):
+        plain = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, estimator=estimator, bin_func=bin_func, cache=False)
+        shared = hydrobox.geostat.variogram(context=ctx, estimator=estimator, bin_func=bin_func)
+        assert np.allclose(plain.experimental, shared.experimental)
+        assert np.allclose(plain.parameters, shared.parameters)
+
+    # the distances are calculated only once
+    assert shared.distance is ctx._distance
+
+    with pytest.raises(ValueError):
+        hydrobox.geostat.variogram(context=ctx, dist_func='cityblock')
+
+
+def test_gridsearch_context():
+    """Gridsearch over the variograms of a PairContext"""
+    df = data.pancake()
+    ctx = hydrobox.geostat.PairContext(df[['x', 'y']].values, df.z.values)
+
+    gs = hydrobox.geostat.gridsearch(
+        {'model': ['spherical', 'exponential']},
+        context=ctx,
+        cross_validate=False,
+        n_jobs=1
+    )
+    plain = [hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, model=m).rmse for m in ('spherical', 'exponential')]
+    assert np.allclose(gs.cv_results_['mean_test_score'], plain)
+
+
+def test_gridsearch_context_shared(monkeypatch):
+    """The cloned estimators share the pairs of the caller's context"""
+    df = data.pancake()
+    ctx = hydrobox.geostat.PairContext(df[['x', 'y']].values, df.z.values)
+
+    calls = []
+    calc_diff = skg.Variogram._calc_diff
+    def counted(self, force=False):
+        calls.append(1)
+        return calc_diff(self, force=force)
+    monkeypatch.setattr(skg.Variogram, '_calc_diff', counted)
+
+    hydrobox.geostat.gridsearch(
+        {'model': ['spherical', 'exponential', 'gaussian', 'cubic']},
+        context=ctx,
+        cross_validate=False,
+        n_jobs=1
+    )
+    assert len(calls) == 1
+    assert ctx._diff is not None and ctx._distance is not None
+
+
+def test_batch_variogram():
+    """Batch variograms equal the variograms of each field"""
+    df = data.pancake()
+    coords = df[['x', 'y']].values[:80]
+    rng = np.random.default_rng(42)
+    values = df.z.values[:80] * rng.uniform(0.5, 2, size=(5, 1)) + rng.normal(size=(5, 80))
+    fields = pd.DataFrame(values, index=pd.date_range('2020-01-01', periods=5))
+
+    # the placeholder values of the lag classes do not warn
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        params = hydrobox.geostat.batch_variogram(coords, fields, model='exponential', warm_start=False)
+    experimental = hydrobox.geostat.batch_variogram(coords, fields, return_type='experimental', max_memory=0.1)
+    unbounded = hydrobox.geostat.batch_variogram(coords, fields, return_type='experimental', max_memory=None)
+    assert (params.index == fields.index).all()
+    assert np.allclose(experimental, unbounded, equal_nan=True)
+
+    for i, v in enumerate(values):
+        vario = hydrobox.geostat.variogram(coords, v, model='exponential', cache=False)
+        assert np.allclose(experimental.iloc[i], vario.experimental)
+        assert np.allclose(params.iloc[i, :3], vario.parameters, rtol=1e-4)
+        assert np.isclose(params.rmse.iloc[i], vario.rmse)
+
+    # missing stations are left out of the pairs
+    values[2, :10] = np.nan
+    params = hydrobox.geostat.batch_variogram(coords, values)
+    assert np.isfinite(params.values).all()
+
+
+def test_fit_models():
+    """Rank all models by the fit to one experimental variogram"""
+    df = data.pancake()
+    vario = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag=0.6, cache=False)
+    ranking = hydrobox.geostat.fit_models(vario)
+
+    assert len(ranking) == 6
+    assert ranking.rmse.is_monotonic_increasing
+    assert vario.describe()['model'] == 'spherical'
+
+    # each model fits like the Variogram
+    for model in ('exponential', 'stable'):
+        vario.model = model
+        assert np.isclose(ranking.loc[model, 'rmse'], vario.rmse)
+        assert np.isclose(ranking.loc[model, 'effective_range'], vario.parameters[0], rtol=1e-4)
+
+    best = hydrobox.geostat.fit_models(vario, models=['gaussian', 'spherical'], score='mae', return_type='best_param')
+    assert best == 'spherical'
+
+
+def test_bootstrap():
+    """Bootstrap envelopes do not depend on the number of workers"""
+    df = data.pancake()
+    vario = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag=0.6)
+
+    result = hydrobox.geostat.bootstrap(vario, n_boot=40, seed=42)
+    parallel = hydrobox.geostat.bootstrap(vario, n_boot=40, seed=42, n_jobs=2)
+    assert np.allclose(result['experimental'], parallel['experimental'])
+    assert np.allclose(result['parameters'], parallel['parameters'])
+
+    # the envelope contains the experimental variogram
+    envelope = result['experimental']
+    assert (envelope.loc[2.5] <= vario.experimental).all()
+    assert (envelope.loc[97.5] >= vario.experimental).all()
+
+    experimental, parameters = hydrobox.geostat.bootstrap(vario, method='cluster', n_clusters=20, n_boot=20, seed=42, return_type='replicates')
+    assert experimental.shape == (20, len(vario.bins))
+    assert list(parameters.columns) == ['effective_range', 'sill', 'nugget']
+
+    jackknife = hydrobox.geostat.bootstrap(vario, method='jackknife', n_clusters=10)
+    assert np.isclose(jackknife['parameters'].loc[50, 'sill'], vario.parameters[1])
+
+    hydrobox.plotting_backend('plotly')
+    fig = hydrobox.geostat.bootstrap(vario, n_boot=20, seed=42, return_type='plot')
+    assert isinstance(fig, go.Figure)
+    assert len(fig.data) == 5
+
+
+def test_bootstrap_envelope_color():
+    """The envelope color is not passed on to Variogram.plot"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.colors import to_rgba
+    df = data.pancake()
+    vario = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, maxlag=0.6)
+    plot_kwargs = dict(envelope_color='red')
+
+    hydrobox.plotting_backend('plotly')
+    fig = hydrobox.geostat.bootstrap(vario, n_boot=20, seed=42, return_type='plot', plot_kwargs=plot_kwargs)
+    assert fig.data[-1].fillcolor == 'red'
+
+    hydrobox.plotting_backend('matplotlib')
+    fig = hydrobox.geostat.bootstrap(vario, n_boot=20, seed=42, return_type='plot', plot_kwargs=plot_kwargs)
+    assert fig.axes[0].collections[-1].get_facecolor()[0][:3] == pytest.approx(to_rgba('red')[:3])
+    assert plot_kwargs == dict(envelope_color='red')
+    hydrobox.plotting_backend('plotly')
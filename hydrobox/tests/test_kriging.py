@@ -0,0 +1,529 @@
+import pytest
+import numpy as np
+
+from hydrobox import data
+import hydrobox
+
+
+def _variogram():
+    df = data.pancake()
+    return hydrobox.geostat.variogram(
+        df[['x', 'y']].values,
+        df.z.values,
+        model='exponential',
+        n_lags=15,
+        return_type='object'
+    )
+
+
+def test_tiled_kriging():
+    """Tiled kriging has to match the full kriging"""
+    vario = _variogram()
+
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 40, return_type='grid')
+    t_field, t_sigma = hydrobox.geostat.ordinary_kriging(
+        vario, 40, return_type='grid', max_memory=0.5
+    )
+
+    assert field.shape == (40, 40)
+    np.testing.assert_allclose(field, t_field)
+    np.testing.assert_allclose(sigma, t_sigma)
+
+
+def test_tiled_kriging_matches_structured():
+    """The flat blocks have to be aligned like a structured gstools grid"""
+    vario = _variogram()
+    krige = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='object')
+    lower, upper = np.min(vario.coordinates, axis=0), np.max(vario.coordinates, axis=0)
+    field, _ = krige.structured([np.linspace(l, u, 30) for l, u in zip(lower, upper)])
+
+    t_field, _ = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid', max_memory=0.2)
+
+    np.testing.assert_allclose(field, t_field)
+
+
+def test_parallel_kriging():
+    """The process pool has to reproduce the serial result exactly"""
+    vario = _variogram()
+
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 40, return_type='grid')
+    p_field, p_sigma = hydrobox.geostat.ordinary_kriging(vario, 40, return_type='grid', n_jobs=2)
+
+    np.testing.assert_array_equal(field, p_field)
+    np.testing.assert_array_equal(sigma, p_sigma)
+
+
+def test_krige_cache():
+    """Kriging the same variogram again has to hit the cache"""
+    vario = _variogram()
+    cache = hydrobox.geostat.krige_cache
+    cache.clear()
+
+    hydrobox.geostat.ordinary_kriging(vario, 20, return_type='grid')
+    hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid')
+    assert cache.info()['hits'] == 1
+    assert cache.info()['misses'] == 1
+
+    # other kriging arguments need another system
+    hydrobox.geostat.simple_kriging(vario, 20, mean=vario.values.mean(), return_type='grid')
+    assert cache.info()['misses'] == 2
+    assert len(cache) == 2
+
+
+def test_krige_cache_eviction():
+    """The least recently used system is evicted first"""
+    cache = hydrobox.geostat.cache.LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+
+
+def test_cache_policy_and_disk(tmp_path):
+    """The eviction policy and the disk tier of the cache"""
+    cache = hydrobox.geostat.cache.LRUCache(maxsize=2, policy='lfu')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'b' not in cache
+
+    fifo = hydrobox.geostat.cache.LRUCache(maxsize=2, policy='fifo')
+    fifo.put('a', 1)
+    fifo.put('b', 2)
+    fifo.get('a')
+    fifo.put('c', 3)
+    assert 'a' not in fifo and 'b' in fifo
+
+    # a new cache on the same directory finds the objects on disk
+    cache = hydrobox.geostat.cache.LRUCache(maxsize=1, directory=str(tmp_path))
+    cache.put('a', np.arange(3))
+    cache.put('b', np.arange(4))
+    restarted = hydrobox.geostat.cache.LRUCache(maxsize=1, directory=str(tmp_path))
+    np.testing.assert_array_equal(restarted.get('a'), np.arange(3))
+    assert restarted.get('c') is None
+    info = restarted.info()
+    assert info['disk_hits'] == 1 and info['misses'] == 1
+    assert info['hit_rate'] == 0.5
+
+    restarted.clear(disk=True)
+    assert restarted.get('a') is None
+
+
+
+def test_batch_kriging():
+    """Batch kriging has to match kriging each field on its own"""
+    vario = _variogram()
+    values = np.stack((vario.values, 2 * vario.values + 1))
+
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 25, return_type='grid')
+    fields, b_sigma = hydrobox.geostat.batch_kriging(vario, values, 25, max_memory=0.5)
+
+    assert fields.shape == (2, 25, 25)
+    np.testing.assert_allclose(fields[0], field)
+    np.testing.assert_allclose(fields[1], 2 * field + 1)
+    np.testing.assert_allclose(b_sigma, sigma)
+
+
+def test_batch_simple_kriging():
+    """Batch kriging with a mean has to match simple kriging of each field"""
+    vario = _variogram()
+    params = vario.describe()['params']
+
+    # shifted fields share the variogram
+    shifts, means = np.array([0., 1., -2.]), np.array([0.3, 1.0, -2.5])
+    values = vario.values + shifts[:, None]
+    fields, b_sigma = hydrobox.geostat.batch_kriging(vario, values, 20, mean=means)
+
+    for v, m, f in zip(values, means, fields):
+        single = hydrobox.geostat.variogram(vario.coordinates, v, cache=False, **params)
+        field, sigma = hydrobox.geostat.simple_kriging(single, 20, mean=m, return_type='grid')
+        np.testing.assert_allclose(f, field, atol=1e-8)
+        np.testing.assert_allclose(b_sigma, sigma, atol=1e-8)
+
+
+def test_kriging_to_disk(tmp_path):
+    """Kriging into memory-mapped files has to match in-memory kriging"""
+    vario = _variogram()
+
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 25, return_type='grid')
+    m_field, m_sigma = hydrobox.geostat.ordinary_kriging(
+        vario, 25, return_type='grid', max_memory=0.5, output_dir=str(tmp_path)
+    )
+
+    assert isinstance(m_field, np.memmap)
+    np.testing.assert_allclose(m_field, field)
+    np.testing.assert_allclose(np.load(tmp_path / 'sigma.npy'), sigma)
+
+
+def test_fast_cross_validation():
+    """The closed-form residuals have to match explicit leave-one-out kriging"""
+    import gstools as gs
+    vario = _variogram()
+    result = hydrobox.geostat.cross_validation(vario)
+
+    coords, values = vario.coordinates, vario.values
+    model = vario.to_gstools()
+    for i in range(5):
+        m = np.arange(len(values)) != i
+        krige = gs.Krige(model, coords[m].T, values[m], unbiased=True, exact=True)
+        field, var = krige(coords[i:i + 1].T)
+
+        assert np.isclose(result['residuals'][i], values[i] - field[0])
+        assert np.isclose(result['variance'][i], var[0])
+
+    assert np.isclose(result['rmse'], np.sqrt(np.mean(result['residuals']**2)))
+
+
+def test_estimate_only():
+    """Skipping the variance has to save memory"""
+    import tracemalloc
+    import plotly.graph_objects as go
+    vario = _variogram()
+
+    # build the cached kriging system beforehand
+    krige = hydrobox.geostat.ordinary_kriging(vario, 10, return_type='object')
+    hydrobox.geostat.ordinary_kriging(vario, 10, return_type='grid')
+    assert hydrobox.geostat.kriging._DualKrige.supports(krige)
+    assert not hydrobox.geostat.kriging._DualKrige.supports(object())
+
+    def run(return_variance):
+        tracemalloc.start()
+        result = hydrobox.geostat.ordinary_kriging(
+            vario, 60, return_type='grid', max_memory=20, return_variance=return_variance
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, peak
+
+    (field, sigma), mem_var = run(True)
+    (e_field, e_sigma), mem_est = run(False)
+
+    assert e_sigma is None
+    np.testing.assert_allclose(e_field, field)
+    assert mem_est < mem_var
+
+    # the plot has to work without the error grid
+    hydrobox.plotting_backend('plotly')
+    fig = hydrobox.geostat.ordinary_kriging(vario, 20, return_variance=False)
+    assert isinstance(fig, go.Figure)
+
+
+def test_masked_grid_kriging():
+    """Only the cells inside the polygon are kriged"""
+    vario = _variogram()
+    lower, upper = np.min(vario.coordinates, axis=0), np.max(vario.coordinates, axis=0)
+    grid = hydrobox.geostat.Grid(list(zip(lower, upper)), 10)
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, grid, return_type='grid')
+
+    # a triangle in the lower left half
+    polygon = np.array([lower, (upper[0], lower[1]), (lower[0], upper[1])])
+    masked = hydrobox.geostat.Grid.from_polygon(polygon, 10, bbox=list(zip(lower, upper)))
+    m_field, m_sigma = hydrobox.geostat.ordinary_kriging(
+        vario, masked, return_type='grid', max_memory=0.5
+    )
+
+    assert masked.shape == grid.shape
+    assert 0 < masked.n_active < grid.size
+    assert np.isnan(m_field[~masked.mask]).all()
+    assert np.isnan(m_sigma[~masked.mask]).all()
+    np.testing.assert_allclose(m_field[masked.mask], field[masked.mask])
+    np.testing.assert_allclose(m_sigma[masked.mask], sigma[masked.mask])
+
+
+def test_grid_from_resolution():
+    """The resolution grid has its outermost cells on the sample bounds"""
+    coords = np.array([[0., 10.], [100., 60.]])
+    grid = hydrobox.geostat.Grid.from_resolution(coords, 11)
+
+    assert grid.shape == (11, 11)
+    np.testing.assert_allclose(grid.axes[0], np.linspace(0, 100, 11))
+    np.testing.assert_allclose(grid.axes[1], np.linspace(10, 60, 11))
+
+
+def test_grid_from_resolution_degenerate():
+    """A constant axis and a resolution of 1 match the linspace axes"""
+    coords = np.column_stack((np.linspace(0, 100, 15), np.full(15, 5.)))
+    grid = hydrobox.geostat.Grid.from_resolution(coords, 20)
+
+    assert grid.shape == (20, 20)
+    np.testing.assert_allclose(grid.axes[0], np.linspace(0, 100, 20))
+    np.testing.assert_allclose(grid.axes[1], np.linspace(5, 5, 20))
+
+    grid = hydrobox.geostat.Grid.from_resolution(coords, 1)
+    assert grid.shape == (1, 1)
+    np.testing.assert_allclose(grid.axes[0], np.linspace(0, 100, 1))
+    np.testing.assert_allclose(grid.axes[1], np.linspace(5, 5, 1))
+
+    # a transect can be kriged on the resolution grid
+    rng = np.random.default_rng(42)
+    vario = hydrobox.geostat.variogram(
+        coords, rng.normal(size=15), model='exponential', n_lags=5, return_type='object'
+    )
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 20, return_type='grid')
+    assert field.shape == (20, 20)
+    assert np.isfinite(field).all()
+
+
+def test_ext_drift_kriging_lazy_drift(tmp_path):
+    """The grid drift can be an array, a memmap or a callable"""
+    vario = _variogram()
+    grid = hydrobox.geostat.Grid.from_resolution(vario.coordinates, 20)
+
+    def dem(pos):
+        return 0.5 * pos[0] + 0.1 * pos[1]
+
+    xx, yy = np.meshgrid(*grid.axes, indexing='ij')
+    drift = dem([xx, yy])
+    np.save(tmp_path / 'dem.npy', drift)
+    args = dict(ext_drift=dem(vario.coordinates.T), return_type='grid', max_memory=0.5)
+
+    # reference: gstools with the full drift
+    krige = hydrobox.geostat.ext_drift_kriging(vario, grid, return_type='object', ext_drift=args['ext_drift'])
+    ref, _ = krige.structured(grid.axes, ext_drift=drift)
+
+    field, _ = hydrobox.geostat.ext_drift_kriging(vario, grid, grid_drift=drift, **args)
+    m_field, _ = hydrobox.geostat.ext_drift_kriging(
+        vario, grid, grid_drift=np.load(tmp_path / 'dem.npy', mmap_mode='r'), n_jobs=2, **args
+    )
+    c_field, _ = hydrobox.geostat.ext_drift_kriging(vario, grid, grid_drift=dem, **args)
+
+    np.testing.assert_allclose(field, ref)
+    np.testing.assert_allclose(m_field, ref)
+    np.testing.assert_allclose(c_field, ref)
+
+
+def test_progressive_kriging():
+    """Each pass is finer and reuses the kriging system"""
+    vario = _variogram()
+    hydrobox.geostat.krige_cache.clear()
+
+    passes = hydrobox.geostat.progressive_kriging(vario, (5, 10, 20), return_type='grid')
+    shapes = [field.shape for _, (field, sigma) in passes]
+
+    assert shapes == [(5, 5), (10, 10), (20, 20)]
+    assert hydrobox.geostat.krige_cache.info()['misses'] == 1
+    assert hydrobox.geostat.krige_cache.info()['hits'] == 2
+
+
+def test_local_kriging():
+    """Local neighbourhoods approximate global kriging"""
+    vario = _variogram()
+    field, sigma = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid')
+
+    # using all observations as neighbours reproduces global kriging
+    n = len(vario.values)
+    a_field, a_sigma = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid', n_neighbours=n)
+    np.testing.assert_allclose(a_field, field)
+    np.testing.assert_allclose(a_sigma, sigma)
+
+    # small neighbourhoods are close, as long as the serial and parallel runs agree
+    l_field, _ = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid', n_neighbours=40)
+    p_field, _ = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid', n_neighbours=40, n_jobs=2)
+    np.testing.assert_array_equal(l_field, p_field)
+    assert np.sqrt(np.mean((l_field - field)**2)) < 0.1 * np.std(field)
+
+    # a small radius leaves cells without neighbours empty
+    r_field, _ = hydrobox.geostat.ordinary_kriging(vario, 30, return_type='grid', search_radius=15)
+    assert not np.isnan(r_field).all()
+
+
+def test_approximate_kriging():
+    """Both approximations have to be close to exact kriging"""
+    vario = _variogram()
+    field, _ = hydrobox.geostat.ordinary_kriging(vario, 20, return_type='grid')
+
+    taper = hydrobox.geostat.approximate_kriging(vario, 20, method='taper', return_type='describe', seed=42)
+    assert taper['rmse'] < 0.05 * np.std(field)
+    assert taper['n_validate'] == 100
+    assert taper['reference'] == 'global'
+
+    # the reference treats the nugget like the taper, thus a taper
+    # spanning the whole sample has no error
+    df = data.pancake()
+    nugget = hydrobox.geostat.variogram(df[['x', 'y']].values, df.z.values, model='exponential', n_lags=15, use_nugget=True)
+    assert nugget.parameters[-1] > 0
+    wide = hydrobox.geostat.approximate_kriging(nugget, 20, taper_range=1e6, return_type='describe', seed=42)
+    assert wide['max_error'] < 1e-4
+
+    # large samples are compared to local systems per validation cell
+    local = hydrobox.geostat.approximate_kriging(vario, 20, method='taper', return_type='describe', n_reference=50, seed=42)
+    assert local['reference'] == 'local'
+    assert local['rmse'] < 0.05 * np.std(field)
+
+    # with all observations as inducing points, the approximation is nearly exact
+    nystroem = hydrobox.geostat.approximate_kriging(
+        vario, 20, method='nystroem', n_inducing=len(vario.values), return_type='describe', seed=42
+    )
+    assert nystroem['rmse'] < 0.01 * np.std(field)
+
+    # the sparse factorization has to survive the process pool
+    t_field, _ = hydrobox.geostat.approximate_kriging(vario, 20, return_type='grid', n_jobs=2)
+    np.testing.assert_allclose(t_field, taper['field'])
+
+
+def test_block_kriging():
+    """Block means have to match the mean of the kriged cells"""
+    vario = _variogram()
+    lower, upper = vario.coordinates.min(axis=0), vario.coordinates.max(axis=0)
+    grid = hydrobox.geostat.Grid(list(zip(lower, upper)), 5)
+    field, _ = hydrobox.geostat.ordinary_kriging(vario, grid, return_type='grid')
+
+    labels = np.full(grid.shape, -1)
+    labels[:20, :20] = 0
+    labels[30:40, 10:30] = 1
+    blocks = hydrobox.geostat.block_kriging(vario, labels, grid=grid, discretization=20)
+    assert blocks.shape == (2, 2)
+    np.testing.assert_allclose(blocks['mean'], [field[labels == 0].mean(), field[labels == 1].mean()])
+    assert (blocks['variance'] >= 0).all()
+
+    # a square polygon discretizes to the same cells as block 0
+    x, y = lower
+    square = np.array([[x, y], [x + 100, y], [x + 100, y + 100], [x, y + 100]])
+    poly = hydrobox.geostat.block_kriging(vario, [square], discretization=20)
+    np.testing.assert_allclose(poly.loc[0].values, blocks.loc[0].values)
+
+    # the weights apply to many fields at once
+    means = hydrobox.geostat.block_kriging(vario, labels, grid=grid, discretization=20, values=np.stack([vario.values, 2 * vario.values]))
+    np.testing.assert_allclose(means.loc[1].values, 2 * means.loc[0].values)
+
+
+def test_block_kriging_anisotropic(monkeypatch):
+    """Block covariances have to follow the rotation of the model"""
+    import gstools as gs
+    vario = _variogram()
+    model = gs.Exponential(dim=2, var=vario.parameters[1], len_scale=[vario.parameters[0] / 3, vario.parameters[0] / 12], angles=0.6)
+    krige = gs.Krige(model, vario.coordinates.T, vario.values, unbiased=True, exact=True)
+    monkeypatch.setattr(hydrobox.geostat.block, '_get_krige', lambda *args, **kwargs: krige)
+
+    lower, upper = vario.coordinates.min(axis=0), vario.coordinates.max(axis=0)
+    grid = hydrobox.geostat.Grid(list(zip(lower, upper)), 5)
+    labels = np.full(grid.shape, -1)
+    labels[10:20, 5:25] = 0
+    blocks = hydrobox.geostat.block_kriging(vario, labels, grid=grid, discretization=20)
+
+    # the block mean is the mean of the point estimates of its cells
+    field, _ = krige(grid.positions(np.flatnonzero(labels.ravel() == 0)), mesh_type='unstructured')
+    np.testing.assert_allclose(blocks.loc[0, 'mean'], field.mean())
+
+
+def test_network_design():
+    """The rank-one update has to match kriging with the added station"""
+    vario = _variogram()
+    lower, upper = vario.coordinates.min(axis=0), vario.coordinates.max(axis=0)
+    candidates = np.random.default_rng(42).uniform(lower, upper, (500, 2))
+
+    ranking = hydrobox.geostat.network_design(vario, candidates, grid_resolution=20)
+    assert len(ranking) == 500
+    assert ranking['variance_reduction'].is_monotonic_decreasing
+
+    # greedy selection starts with the best candidate
+    selected = hydrobox.geostat.network_design(vario, candidates, grid_resolution=20, n_stations=3, max_memory=1)
+    assert selected.index[0] == ranking.index[0]
+    assert selected['mean_variance'].is_monotonic_decreasing
+
+    # krige again with the selected stations
+    krige = vario.to_gs_krige()
+    coords = np.vstack([vario.coordinates, candidates[selected.index]])
+    krige.set_condition(tuple(coords.T), np.zeros(len(coords)))
+    grid = hydrobox.geostat.Grid.from_resolution(vario.coordinates, 20)
+    _, sigma = krige(grid.positions(slice(0, grid.size)), mesh_type='unstructured')
+    np.testing.assert_allclose(selected['mean_variance'].iloc[-1], sigma.mean())
+
+
+def test_simulate(tmp_path):
+    """The streaming statistics have to match the ensemble"""
+    vario = _variogram()
+    result = hydrobox.geostat.simulate(
+        vario, 15, n_realizations=40, quantiles=[0.1, 0.9], seed=42, return_ensemble=True
+    )
+    ensemble = result['ensemble']
+    assert ensemble.shape == (40, 15, 15)
+    np.testing.assert_allclose(result['mean'], ensemble.mean(axis=0))
+    np.testing.assert_allclose(result['variance'], ensemble.var(axis=0, ddof=1))
+    assert (result['quantiles'][0] <= result['quantiles'][1]).all()
+
+    # the seeds do not depend on the number of workers
+    parallel = hydrobox.geostat.simulate(
+        vario, 15, n_realizations=40, seed=42, return_ensemble=True, n_jobs=2, output_dir=str(tmp_path)
+    )
+    np.testing.assert_array_equal(parallel['ensemble'], ensemble)
+    np.testing.assert_allclose(parallel['mean'], result['mean'])
+    assert (tmp_path / 'ensemble.npy').exists()
+
+    # each worker accumulates the moments of its realizations
+    moments = hydrobox.geostat.simulate(vario, 15, n_realizations=40, quantiles=[0.1, 0.9], seed=42, n_jobs=3)
+    np.testing.assert_allclose(moments['mean'], result['mean'])
+    np.testing.assert_allclose(moments['variance'], result['variance'])
+    np.testing.assert_allclose(moments['quantiles'], result['quantiles'])
+
+
+def test_inverse_distance():
+    """IDW has to reproduce the observations and match in parallel"""
+    vario = _variogram()
+    field, sigma = hydrobox.geostat.inverse_distance(vario, 50, return_type='grid')
+    assert field.shape == (50, 50)
+    assert sigma is None
+    assert field.min() >= vario.values.min() and field.max() <= vario.values.max()
+
+    p_field, _ = hydrobox.geostat.inverse_distance(vario, 50, return_type='grid', max_memory=0.1, n_jobs=2)
+    np.testing.assert_array_equal(field, p_field)
+
+    # cells on an observation take its value
+    idw = hydrobox.geostat.idw.IDW(vario)
+    np.testing.assert_allclose(idw(list(vario.coordinates[:5].T)), vario.values[:5])
+
+    # IDW needs no variogram
+    c_field, _ = hydrobox.geostat.inverse_distance(vario.coordinates, 50, values=vario.values, return_type='grid')
+    np.testing.assert_array_equal(field, c_field)
+    with pytest.raises(AttributeError):
+        hydrobox.geostat.inverse_distance(vario.coordinates, 50)
+    with pytest.raises(AttributeError):
+        hydrobox.geostat.inverse_distance(vario, None)
+
+
+def test_thiessen():
+    """Thiessen weights have to re-weight missing stations"""
+    stations = np.array([[25., 50.], [75., 50.], [75., 90.]])
+    square = np.array([[0., 0.], [100., 0.], [100., 100.], [0., 100.]])
+    thiessen = hydrobox.geostat.Thiessen(stations, [square], discretization=100)
+
+    weights = thiessen.weights().toarray()[:, 0]
+    np.testing.assert_allclose(weights.sum(), 1)
+    assert weights[0] > weights[1] > weights[2] > 0
+
+    # a missing station gives its area to the others
+    values = np.array([[1., 2., 3.], [1., 2., np.nan], [1., 2., np.nan], [np.nan] * 3])
+    means = thiessen.apply(values)
+    assert means.shape == (4, 1)
+    np.testing.assert_allclose(means[0, 0], weights @ values[0])
+    np.testing.assert_allclose(means[1, 0], 1.5)
+    assert np.isnan(means[3, 0])
+
+    # the weights of each pattern are built only once
+    assert thiessen.cache.info()['misses'] == 2
+
+
+def test_zonal_statistics():
+    """Zonal statistics of a stack have to match per-zone numpy"""
+    from hydrobox.geostat.zonal import zone_cache
+    grid = hydrobox.geostat.Grid([(0, 40), (0, 40)], 1)
+    rng = np.random.default_rng(42)
+    labels = rng.integers(-1, 20, size=grid.shape)
+    fields = rng.normal(size=(10, ) + grid.shape)
+    fields[:, 0, :5] = np.nan
+
+    zone_cache.clear()
+    for statistic, func in (('mean', np.nanmean), ('min', np.nanmin), ('max', np.nanmax), ('sum', np.nansum)):
+        result = hydrobox.geostat.zonal_statistics(fields, labels, statistic=statistic)
+        assert result.shape == (10, 20)
+        np.testing.assert_allclose(result[3].values, func(fields[:, labels == 3], axis=1))
+    assert zone_cache.info()['misses'] == 1
+
+    # overlapping polygons on a single field
+    square = np.array([[0., 0.], [20., 0.], [20., 20.], [0., 20.]])
+    means = hydrobox.geostat.zonal_statistics(fields[1], [square, square + 10], grid=grid)
+    np.testing.assert_allclose(means[0], np.nanmean(fields[1, :20, :20]))